@@ -0,0 +1,44 @@
+"""add product sku and unique offers
+
+Revision ID: 0fac7dad84dc
+Revises: d9f02154f50a
+Create Date: 2026-10-18 17:31:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0fac7dad84dc'
+down_revision: Union[str, Sequence[str], None] = 'd9f02154f50a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('sku', sa.String(), nullable=True))
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+    # A store keeps its cheapest offer for a product (lowest id on ties) before the index turns unique
+    op.execute(
+        """
+        DELETE FROM offers WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY store_id, product_id ORDER BY price, id) AS rn
+                FROM offers
+            ) AS ranked WHERE rn = 1
+        )
+        """
+    )
+    op.drop_index('ix_offers_store_id_product_id', table_name='offers')
+    op.create_index('ix_offers_store_id_product_id', 'offers', ['store_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_offers_store_id_product_id', table_name='offers')
+    op.create_index('ix_offers_store_id_product_id', 'offers', ['store_id', 'product_id'], unique=False)
+    op.drop_index('ix_products_sku', table_name='products')
+    op.drop_column('products', 'sku')
@@ -0,0 +1,37 @@
+"""add product search index
+
+Revision ID: 1786d66e8d4c
+Revises: 20485c884abb
+Create Date: 2026-10-18 16:02:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '1786d66e8d4c'
+down_revision: Union[str, Sequence[str], None] = '20485c884abb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "name, category, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "INSERT INTO products_fts(rowid, name, category, description) "
+        "SELECT id, name, category, COALESCE(description, '') FROM products"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE IF EXISTS products_fts")
@@ -0,0 +1,44 @@
+"""add best retailer to products
+
+Revision ID: 20485c884abb
+Revises: 8ea6929dae20
+Create Date: 2026-10-18 14:58:13.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '20485c884abb'
+down_revision: Union[str, Sequence[str], None] = '8ea6929dae20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('best_retailer_id', sa.Integer(), nullable=True))
+    op.create_index('ix_retailers_product_id_price', 'retailers', ['product_id', 'price'], unique=False)
+    # Backfill the best offer (and its price) for every product
+    op.execute(
+        """
+        UPDATE products SET
+            best_retailer_id = (
+                SELECT r.id FROM retailers r
+                WHERE r.product_id = products.id AND r.price IS NOT NULL
+                ORDER BY r.price, r.id LIMIT 1
+            ),
+            price = (
+                SELECT MIN(r.price) FROM retailers r
+                WHERE r.product_id = products.id
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_retailers_product_id_price', table_name='retailers')
+    op.drop_column('products', 'best_retailer_id')
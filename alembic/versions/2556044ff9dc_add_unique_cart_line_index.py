@@ -0,0 +1,40 @@
+"""add unique cart line index
+
+Revision ID: 2556044ff9dc
+Revises: 0fac7dad84dc
+Create Date: 2026-10-18 19:12:27.640233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '2556044ff9dc'
+down_revision: Union[str, Sequence[str], None] = '0fac7dad84dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold duplicate lines into the newest one before the index turns unique
+    op.execute(
+        """
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(c.quantity) FROM cart_items c
+            WHERE c.user_id = cart_items.user_id AND c.product_id = cart_items.product_id
+              AND c.retailer_id = cart_items.retailer_id
+        )
+        WHERE id IN (SELECT MAX(id) FROM cart_items GROUP BY user_id, product_id, retailer_id HAVING COUNT(*) > 1)
+        """
+    )
+    op.execute(
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT MAX(id) FROM cart_items GROUP BY user_id, product_id, retailer_id)"
+    )
+    op.create_index('ix_cart_items_user_product_retailer', 'cart_items', ['user_id', 'product_id', 'retailer_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cart_items_user_product_retailer', table_name='cart_items')
@@ -0,0 +1,99 @@
+"""convert order date to datetime
+
+Revision ID: 48c4aeff3eca
+Revises: 8582086f0bde
+Create Date: 2026-10-18 12:26:09.530716
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '48c4aeff3eca'
+down_revision: Union[str, Sequence[str], None] = '8582086f0bde'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+# Unparseable dates stop the upgrade; this many of their order ids are listed
+REPORTED_IDS = 20
+
+orders = sa.table(
+    'orders',
+    sa.column('id', sa.Integer),
+    sa.column('date', sa.String),
+    sa.column('placed_at', sa.DateTime),
+)
+
+
+def parse_order_date(value):
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def order_batches(bind):
+    # Id-ordered batches so large tables never sit in memory at once
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(orders.c.id, orders.c.date).where(orders.c.id > last_id).order_by(orders.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def check_order_dates(bind):
+    """Refuse to convert before touching the schema if any date would be lost."""
+    unparseable = 0
+    ids = []
+    for rows in order_batches(bind):
+        for row in rows:
+            if parse_order_date(row.date) is None:
+                unparseable += 1
+                if len(ids) < REPORTED_IDS:
+                    ids.append(row.id)
+    if unparseable:
+        raise RuntimeError(
+            f"{unparseable} orders have a date that cannot be parsed (order ids {', '.join(map(str, ids))}"
+            f"{', ...' if unparseable > len(ids) else ''}); correct them to ISO 8601 and run the upgrade again"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    check_order_dates(bind)
+    op.add_column('orders', sa.Column('placed_at', sa.DateTime(), nullable=True))
+
+    for rows in order_batches(bind):
+        bind.execute(
+            orders.update().where(orders.c.id == sa.bindparam('order_id')).values(placed_at=sa.bindparam('placed_at')),
+            [{'order_id': row.id, 'placed_at': parse_order_date(row.date)} for row in rows],
+        )
+
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('date')
+        batch_op.alter_column('placed_at', new_column_name='date', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_orders_date', 'orders', ['date'], unique=False)
+    op.create_index('ix_orders_user_id_date', 'orders', ['user_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_id_date', table_name='orders')
+    op.drop_index('ix_orders_date', table_name='orders')
+    op.add_column('orders', sa.Column('date_text', sa.String(), nullable=True))
+    op.execute("UPDATE orders SET date_text = strftime('%Y-%m-%dT%H:%M:%fZ', date)")
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('date')
+        batch_op.alter_column('date_text', new_column_name='date', existing_type=sa.String(), nullable=False)
@@ -0,0 +1,82 @@
+"""add dashboard aggregate tables
+
+Revision ID: 8582086f0bde
+Revises: 8aa46c821696
+Create Date: 2026-10-18 11:03:27.918240
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '8582086f0bde'
+down_revision: Union[str, Sequence[str], None] = '8aa46c821696'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema and backfill it from the existing rows, as the rebuild would."""
+    op.create_table(
+        'metric_totals',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    daily_order_stats = op.create_table(
+        'daily_order_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+    op.create_table(
+        'product_sales',
+        sa.Column('product_name', sa.String(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('product_name'),
+    )
+    op.execute(
+        """
+        INSERT INTO metric_totals (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'products', COUNT(*) FROM products
+        UNION ALL SELECT 'stores', COUNT(DISTINCT name) FROM retailers
+        UNION ALL SELECT 'orders', COUNT(*) FROM orders
+        UNION ALL SELECT 'revenue', COALESCE(SUM(total), 0) FROM orders
+        """
+    )
+    # orders.date is still a string here: group on its 'YYYY-MM-DD' prefix and skip the rest
+    daily = {}
+    for prefix, count, total in op.get_bind().execute(
+        sa.text("SELECT SUBSTR(date, 1, 10), COUNT(*), SUM(total) FROM orders GROUP BY SUBSTR(date, 1, 10)")
+    ):
+        try:
+            day = date.fromisoformat(prefix)
+        except (TypeError, ValueError):
+            continue
+        orders, revenue = daily.get(day, (0, 0))
+        daily[day] = (orders + count, revenue + total)
+    if daily:
+        op.bulk_insert(daily_order_stats, [
+            {'day': day, 'orders': count, 'revenue': total} for day, (count, total) in daily.items()
+        ])
+    op.execute(
+        """
+        INSERT INTO product_sales (product_name, units)
+        SELECT product_name, SUM(quantity) FROM order_items GROUP BY product_name
+        """
+    )
+    # Built after the backfill so the bulk insert does not maintain it row by row
+    op.create_index(op.f('ix_product_sales_units'), 'product_sales', ['units'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_product_sales_units'), table_name='product_sales')
+    op.drop_table('product_sales')
+    op.drop_table('daily_order_stats')
+    op.drop_table('metric_totals')
@@ -0,0 +1,29 @@
+"""add updated_at to products
+
+Revision ID: 8aa46c821696
+Revises: 2008e905b6e9
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '8aa46c821696'
+down_revision: Union[str, Sequence[str], None] = '2008e905b6e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # SQLite cannot add a column with a non-constant default, so backfill separately
+    op.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'updated_at')
@@ -0,0 +1,50 @@
+"""add order status
+
+Revision ID: 8ea6929dae20
+Revises: 48c4aeff3eca
+Create Date: 2026-10-18 13:41:52.117094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '8ea6929dae20'
+down_revision: Union[str, Sequence[str], None] = '48c4aeff3eca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPEN_STATUSES = "status IN ('pending', 'processing')"
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Existing orders start as 'pending', matching the dashboard's previous behaviour of
+    treating every order as unfulfilled, so the open-order counter starts at the order count.
+    """
+    op.add_column('orders', sa.Column('status', sa.String(), nullable=False, server_default='pending'))
+    op.create_index(
+        'ix_orders_open',
+        'orders',
+        ['id'],
+        unique=False,
+        sqlite_where=sa.text(OPEN_STATUSES),
+        postgresql_where=sa.text(OPEN_STATUSES),
+    )
+    op.execute(
+        f"""
+        INSERT INTO metric_totals (name, value)
+        SELECT 'open_orders', COUNT(*) FROM orders WHERE {OPEN_STATUSES}
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM metric_totals WHERE name = 'open_orders'")
+    op.drop_index('ix_orders_open', table_name='orders')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('status')
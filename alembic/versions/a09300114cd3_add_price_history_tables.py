@@ -0,0 +1,71 @@
+"""add price history tables
+
+Revision ID: a09300114cd3
+Revises: 2556044ff9dc
+Create Date: 2026-10-18 20:41:05.118362
+
+"""
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a09300114cd3'
+down_revision: Union[str, Sequence[str], None] = '2556044ff9dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DAY = 86400
+WEEK = 7 * DAY
+
+
+def rollup_table(name):
+    op.create_table(
+        name,
+        sa.Column('offer_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.Column('low', sa.Integer(), nullable=False),
+        sa.Column('high', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('close', sa.Integer(), nullable=False),
+        sa.Column('closed_at', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('offer_id', 'bucket'),
+        sqlite_with_rowid=False,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'price_observations',
+        sa.Column('offer_id', sa.Integer(), nullable=False),
+        sa.Column('observed_at', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('offer_id', 'observed_at'),
+        sqlite_with_rowid=False,
+    )
+    rollup_table('price_rollups_daily')
+    rollup_table('price_rollups_weekly')
+
+    # History starts with today's prices: one observation per priced offer, already rolled up
+    now = int(time.time())
+    op.execute(sa.text(
+        "INSERT INTO price_observations (offer_id, observed_at, price) "
+        "SELECT id, :now, CAST(ROUND(price * 100) AS INTEGER) FROM offers WHERE price IS NOT NULL"
+    ).bindparams(now=now))
+    # Weekly buckets start on Monday; unix time 0 was a Thursday
+    for table, bucket in (('price_rollups_daily', now - now % DAY), ('price_rollups_weekly', now - (now + 3 * DAY) % WEEK)):
+        op.execute(sa.text(
+            f"INSERT INTO {table} (offer_id, bucket, low, high, total, samples, close, closed_at) "
+            "SELECT offer_id, :bucket, price, price, price, 1, price, observed_at FROM price_observations"
+        ).bindparams(bucket=bucket))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_rollups_weekly')
+    op.drop_table('price_rollups_daily')
+    op.drop_table('price_observations')
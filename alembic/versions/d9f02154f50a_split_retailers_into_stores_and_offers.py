@@ -0,0 +1,107 @@
+"""split retailers into stores and offers
+
+Revision ID: d9f02154f50a
+Revises: 1786d66e8d4c
+Create Date: 2026-10-18 16:48:09.531772
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd9f02154f50a'
+down_revision: Union[str, Sequence[str], None] = '1786d66e8d4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Names the unnamed foreign keys SQLite reflects, so batch mode can drop them
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stores',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('logo', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('delivery_options', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    op.create_index('ix_stores_id', 'stores', ['id'], unique=False)
+    op.create_table(
+        'offers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('store_id', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.ForeignKeyConstraint(['store_id'], ['stores.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_offers_id', 'offers', ['id'], unique=False)
+    # One store per distinct retailer name; per-product ratings average into the store's
+    op.execute(
+        """
+        INSERT INTO stores (name, logo, description, rating, delivery_options)
+        SELECT name, MAX(logo), MAX(description), ROUND(AVG(rating), 2), MAX(delivery_options)
+        FROM retailers GROUP BY name ORDER BY MIN(id)
+        """
+    )
+    # Offers keep the retailer row ids: best_retailer_id, cart items and API clients refer to them
+    op.execute(
+        """
+        INSERT INTO offers (id, product_id, store_id, price)
+        SELECT r.id, r.product_id, s.id, r.price
+        FROM retailers r JOIN stores s ON s.name = r.name
+        WHERE r.product_id IS NOT NULL
+        """
+    )
+    # Built after the backfill so the bulk insert does not maintain them row by row
+    op.create_index('ix_offers_product_id_price', 'offers', ['product_id', 'price'], unique=False)
+    op.create_index('ix_offers_store_id_product_id', 'offers', ['store_id', 'product_id'], unique=False)
+    with op.batch_alter_table('cart_items', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('fk_cart_items_retailer_id_retailers', type_='foreignkey')
+        batch_op.create_foreign_key('fk_cart_items_retailer_id_offers', 'offers', ['retailer_id'], ['id'])
+    op.drop_index('ix_retailers_product_id_price', table_name='retailers')
+    op.drop_table('retailers')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        'retailers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('logo', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('delivery_options', sa.String(), nullable=True),
+        sa.Column('product_id', sa.Integer(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_retailers_id', 'retailers', ['id'], unique=False)
+    op.execute(
+        """
+        INSERT INTO retailers (id, name, logo, description, rating, delivery_options, product_id, price)
+        SELECT o.id, s.name, s.logo, s.description, s.rating, s.delivery_options, o.product_id, o.price
+        FROM offers o JOIN stores s ON s.id = o.store_id
+        """
+    )
+    op.create_index('ix_retailers_product_id_price', 'retailers', ['product_id', 'price'], unique=False)
+    with op.batch_alter_table('cart_items', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('fk_cart_items_retailer_id_offers', type_='foreignkey')
+        batch_op.create_foreign_key('fk_cart_items_retailer_id_retailers', 'retailers', ['retailer_id'], ['id'])
+    op.drop_index('ix_offers_store_id_product_id', table_name='offers')
+    op.drop_index('ix_offers_product_id_price', table_name='offers')
+    op.drop_index('ix_offers_id', table_name='offers')
+    op.drop_table('offers')
+    op.drop_index('ix_stores_id', table_name='stores')
+    op.drop_table('stores')
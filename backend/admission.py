@@ -0,0 +1,189 @@
+"""Admission control: per route class concurrency limits with bounded queues.
+
+Requests are sorted into route classes by path (ROUTE_CLASSES). Each class admits up to
+its concurrency limit at once and queues a bounded number more, so a login storm or a
+burst of admin dashboards saturates its own class and never delays checkout or catalog
+reads. A request is shed with 503 and Retry-After when:
+
+  - its class queue is full,
+  - the queue ahead of it would take longer than the class deadline to drain, going
+    by the class's recent service time (rejected straight away rather than after waiting), or
+  - it has waited the whole deadline without getting a slot.
+
+Streaming exports and feed imports, which hold a slot for minutes, have their own class.
+
+Limits are per process and per class, e.g. ADMISSION_CATALOG_CONCURRENCY,
+ADMISSION_CATALOG_QUEUE and ADMISSION_CATALOG_DEADLINE_MS. Paths outside every class
+(/, /metrics, /docs) are never limited.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from fastapi.responses import JSONResponse
+from .hashing import HASH_WORKERS, HASH_MAX_PENDING
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Weight of the newest request in a class's service time average
+SERVICE_TIME_ALPHA = 0.2
+
+# (class, methods or None for all, path prefixes); the first match wins
+ROUTE_CLASSES = (
+    ("auth", {"POST"}, ("/token", "/register", "/admin/login")),
+    # Streams and imports hold a slot for minutes; kept apart so they don't skew admin's service time
+    ("bulk", {"POST"}, ("/admin/import",)),
+    ("bulk", {"GET"}, ("/admin/users/export", "/admin/orders/export")),
+    ("checkout", None, ("/api/orders", "/cart")),
+    ("admin", None, ("/admin",)),
+    ("catalog", None, ("/products", "/compare", "/retailers")),
+)
+
+# Default (concurrency, queue, deadline ms) per class. Auth admits a little more than the
+# hash pool runs so the pool stays busy; admin is kept small because its scans are heavy.
+DEFAULT_LIMITS = {
+    "catalog": (64, 256, 1000),
+    "checkout": (32, 256, 5000),
+    "auth": (HASH_WORKERS * 2, HASH_MAX_PENDING, 2000),
+    "admin": (4, 16, 5000),
+    "bulk": (2, 4, 30000),
+}
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+
+class RouteClass:
+    def __init__(self, name: str, concurrency: int, queue: int, deadline_ms: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.deadline = deadline_ms / 1000
+        self.active = 0
+        self._waiters = deque()
+        self.service_seconds = 0.0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    @classmethod
+    def from_env(cls, name: str) -> "RouteClass":
+        concurrency, queue, deadline_ms = DEFAULT_LIMITS[name]
+        prefix = f"ADMISSION_{name.upper()}_"
+        return cls(
+            name,
+            int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+            int(os.getenv(prefix + "QUEUE", queue)),
+            float(os.getenv(prefix + "DEADLINE_MS", deadline_ms)),
+        )
+
+    def expected_wait(self, position: int) -> float:
+        # Slots free up `concurrency` at a time, each after about one service time
+        return math.ceil(position / self.concurrency) * self.service_seconds
+
+    def _reject(self, reason: str, wait: float):
+        self.shed[reason] += 1
+        raise Shed(reason, wait)
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        position = len(self._waiters) + 1
+        if position > self.queue:
+            self._reject("queue_full", self.expected_wait(position))
+        if self.expected_wait(position) > self.deadline:
+            self._reject("deadline", self.expected_wait(position))
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.deadline)
+        except BaseException as e:  # timed out, or the client went away while queued
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timeout", self.expected_wait(len(self._waiters) + 1))
+            raise
+        self.admitted += 1
+
+    def release(self, seconds: float | None = None):
+        if seconds is not None:
+            # Capped at the deadline, so one very long request can't make the class shed everything
+            seconds = min(seconds, self.deadline)
+            self.service_seconds += SERVICE_TIME_ALPHA * (seconds - self.service_seconds)
+        # Hand the slot straight to the next waiter still waiting
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "deadlineMs": self.deadline * 1000,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "serviceMs": round(self.service_seconds * 1000, 2),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+route_classes = {name: RouteClass.from_env(name) for name in DEFAULT_LIMITS}
+
+def classify(method: str, path: str) -> RouteClass | None:
+    for name, methods, prefixes in ROUTE_CLASSES:
+        if methods is not None and method not in methods:
+            continue
+        if any(path == prefix or path.startswith(prefix + "/") for prefix in prefixes):
+            return route_classes[name]
+    return None
+
+def stats() -> dict:
+    return {name: route_class.stats() for name, route_class in route_classes.items()}
+
+def prometheus_lines() -> list:
+    lines = ["# HELP royalbee_admission_shed_total Requests rejected with 503 by route class and reason.",
+             "# TYPE royalbee_admission_shed_total counter"]
+    for name, route_class in route_classes.items():
+        lines += [f'royalbee_admission_shed_total{{class="{name}",reason="{reason}"}} {n}' for reason, n in route_class.shed.items()]
+    lines += ["# HELP royalbee_admission_admitted_total Requests admitted by route class.",
+              "# TYPE royalbee_admission_admitted_total counter"]
+    lines += [f'royalbee_admission_admitted_total{{class="{n}"}} {c.admitted}' for n, c in route_classes.items()]
+    lines += ["# HELP royalbee_admission_queued Requests waiting for a slot by route class.",
+              "# TYPE royalbee_admission_queued gauge"]
+    lines += [f'royalbee_admission_queued{{class="{n}"}} {len(c._waiters)}' for n, c in route_classes.items()]
+    return lines
+
+class AdmissionMiddleware:
+    """Plain ASGI middleware; a slot is held until the response's last byte is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            return await self.app(scope, receive, send)
+        try:
+            await route_class.acquire()
+        except Shed as e:
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
+            return await response(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release(time.perf_counter() - start)
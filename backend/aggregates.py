@@ -0,0 +1,122 @@
+"""Incrementally maintained dashboard aggregates.
+
+The write paths in crud.py update these tables in the same transaction as the rows they
+describe, so /admin/metrics reads a handful of small rows instead of scanning history.
+`rebuild` recomputes everything from the base tables for backfills and repairs:
+
+    python -m backend.aggregates rebuild
+"""
+import sys
+from collections import Counter
+from datetime import date, datetime
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from . import models
+
+TOTALS = ("users", "products", "stores", "orders", "revenue", "open_orders")
+
+def upsert(db, model):
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+def order_day(value) -> date | None:
+    # Accepts an order datetime or the 'YYYY-MM-DD' string SQLite's date() returns
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+def totals_statement(db, deltas: dict):
+    stmt = upsert(db, models.MetricTotal).values([{"name": k, "value": v} for k, v in deltas.items()])
+    return stmt.on_conflict_do_update(index_elements=["name"], set_={"value": models.MetricTotal.value + stmt.excluded.value})
+
+def order_statements(db, order):
+    yield totals_statement(db, {"orders": 1, "revenue": order.total, "open_orders": 1})
+    day = order_day(order.date)
+    if day is not None:
+        stmt = upsert(db, models.DailyOrderStat).values(day=day, orders=1, revenue=order.total)
+        yield stmt.on_conflict_do_update(
+            index_elements=["day"],
+            set_={
+                "orders": models.DailyOrderStat.orders + stmt.excluded.orders,
+                "revenue": models.DailyOrderStat.revenue + stmt.excluded.revenue,
+            },
+        )
+    # One row per product so the statement never touches the same row twice
+    units = Counter()
+    for item in order.items:
+        units[item.product_name] += item.quantity
+    if units:
+        stmt = upsert(db, models.ProductSales).values([{"product_name": k, "units": v} for k, v in units.items()])
+        yield stmt.on_conflict_do_update(
+            index_elements=["product_name"], set_={"units": models.ProductSales.units + stmt.excluded.units}
+        )
+
+async def bump(db, **deltas):
+    await db.execute(totals_statement(db, deltas))
+
+async def record_order(db, order):
+    for stmt in order_statements(db, order):
+        await db.execute(stmt)
+
+async def dashboard(db, since: date, today: date) -> dict:
+    totals = dict((await db.execute(select(models.MetricTotal.name, models.MetricTotal.value))).all())
+    days = dict((await db.execute(
+        select(models.DailyOrderStat.day, models.DailyOrderStat.orders).where(models.DailyOrderStat.day >= since)
+    )).all())
+    top_products = (await db.execute(
+        select(models.ProductSales.product_name, models.ProductSales.units).order_by(models.ProductSales.units.desc()).limit(5)
+    )).all()
+    return {
+        **{name: totals.get(name, 0) if name == "revenue" else int(totals.get(name, 0)) for name in TOTALS},
+        "ordersToday": days.get(today, 0),
+        "ordersSince": sum(days.values()),
+        "topProducts": [{"name": name, "sold": sold} for name, sold in top_products],
+    }
+
+def rebuild(db: Session):
+    for model in (models.MetricTotal, models.DailyOrderStat, models.ProductSales):
+        db.execute(delete(model))
+    orders, revenue = db.execute(select(func.count(models.Order.id), func.coalesce(func.sum(models.Order.total), 0))).one()
+    db.execute(insert(models.MetricTotal), [
+        {"name": "users", "value": db.scalar(select(func.count(models.User.id)))},
+        {"name": "products", "value": db.scalar(select(func.count(models.Product.id)))},
+        {"name": "stores", "value": db.scalar(select(func.count(models.Store.id)))},
+        {"name": "orders", "value": orders},
+        {"name": "revenue", "value": revenue},
+        {"name": "open_orders", "value": db.scalar(
+            select(func.count(models.Order.id)).where(models.order_is_open())
+        )},
+    ])
+    daily = {}
+    order_date = func.date(models.Order.date)
+    for day_str, count, total in db.execute(
+        select(order_date, func.count(models.Order.id), func.sum(models.Order.total)).group_by(order_date)
+    ):
+        day = order_day(day_str)
+        if day is not None:
+            orders_on_day, revenue_on_day = daily.get(day, (0, 0))
+            daily[day] = (orders_on_day + count, revenue_on_day + total)
+    if daily:
+        db.execute(insert(models.DailyOrderStat), [
+            {"day": day, "orders": count, "revenue": total} for day, (count, total) in daily.items()
+        ])
+    sales = db.execute(
+        select(models.OrderItem.product_name, func.sum(models.OrderItem.quantity)).group_by(models.OrderItem.product_name)
+    ).all()
+    if sales:
+        db.execute(insert(models.ProductSales), [{"product_name": name, "units": units} for name, units in sales])
+    db.commit()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m backend.aggregates rebuild")
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        rebuild(db)
+    print("Aggregates rebuilt.")
@@ -1,21 +1,24 @@
-import bcrypt
+import hashlib
+import os
+import time
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from . import models, database
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas, database
+from .cache import LRUCache
 
 SECRET_KEY = "your_secret_key_here"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
 
-# Password hashing
+# Password hashing (implemented in hashing.py so the process pool never imports the web stack)
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+from .hashing import hash_password, verify_password, needs_rehash, hash_pool
 
 # JWT creation/verification
 
@@ -33,14 +36,49 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
+# Verified payloads keyed by token hash, each kept no longer than the token itself is valid
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# Short-lived snapshots of the user behind a token subject, dropped by invalidate_user()
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def verify_access_token(token: str):
+    key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = decode_access_token(token)
+        if payload is None:
+            return None
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            token_cache.set(key, payload, ttl=min(remaining, token_cache.ttl))
+    return payload
+
+async def get_user_principal(db: AsyncSession, field: str, value):
+    """Return a `UserOut` snapshot for the user whose `field` ("email" or "id") equals `value`."""
+    key = (field, value)
+    principal = user_cache.get(key)
+    if principal is None:
+        column = models.User.email if field == "email" else models.User.id
+        user = await db.scalar(select(models.User).where(column == value))
+        if user is None:
+            return None
+        principal = schemas.UserOut.model_validate(user)
+        user_cache.set(key, principal)
+    return principal
+
+def invalidate_user(user_id: int, email: str | None = None):
+    # Call after changing a user's role, points or anything else exposed by UserOut
+    user_cache.pop(("id", user_id))
+    if email is not None:
+        user_cache.pop(("email", email))
+
 # Dependency to get current admin user
 
-def get_current_admin_user(request: Request, db: Session = Depends(database.get_db)):
+async def get_current_admin_user(request: Request, db: AsyncSession = Depends(database.get_db)):
     token = request.cookies.get("admin_access_token") or request.headers.get("Authorization", "").replace("Bearer ", "")
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    payload = decode_access_token(token)
-    print('DEBUG payload:', payload)
+    payload = verify_access_token(token)
     if not payload:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     user_id = payload.get("sub")
@@ -48,8 +86,7 @@ def get_current_admin_user(request: Request, db: Session = Depends(database.get_
         user_id = int(user_id)
     except (TypeError, ValueError):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    print('DEBUG user:', user)
+    user = await get_user_principal(db, "id", user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return user
@@ -0,0 +1,44 @@
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+from .cache import LRUCache
+
+# Serialized /products pages, keyed by catalog version so that any product write
+# makes older pages unreachable. Writes in another worker process are only picked up
+# once the TTL expires.
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+# `encoded` holds compressed copies of the body by encoding, filled on first request
+CachedPage = namedtuple("CachedPage", ["body", "etag", "last_modified", "encoded"])
+
+page_cache = LRUCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+_version = 0
+_version_lock = threading.Lock()
+# When the current version began; a worker starts after every write it could have missed
+_modified_at = datetime.utcnow()
+
+def current_version() -> int:
+    return _version
+
+def modified_at() -> datetime:
+    return _modified_at
+
+def bump_version() -> int:
+    global _version, _modified_at
+    with _version_lock:
+        _version += 1
+        _modified_at = datetime.utcnow()
+        page_cache.clear()
+        return _version
+
+def get_page(version: int, key: tuple):
+    return page_cache.get((version,) + key)
+
+def put_page(version: int, key: tuple, page: CachedPage):
+    page_cache.set((version,) + key, page)
+    return page
+
+def stats() -> dict:
+    return {"version": _version, **page_cache.stats()}
@@ -0,0 +1,204 @@
+"""Response compression.
+
+`CompressionMiddleware` encodes text-like responses (JSON, NDJSON, CSV, text) with the
+best encoding the client accepts: brotli when the optional `brotli` package is
+installed, else gzip. Bodies under COMPRESSION_MIN_BYTES go out as they are, since the
+framing overhead outweighs the saving there. Streaming responses (exports) are compressed
+chunk by chunk, so they stay streaming.
+
+A compressed body is a different byte sequence, so its ETag is sent weak (W/"...");
+conditional.py matches weak tags on If-None-Match.
+
+Bodies that are themselves cached (catalog pages) keep their compressed copies next to
+them through `cached_variant`, so a cache hit costs no compression at all.
+
+Bytes in and out per encoding are counted, for /metrics and /admin/metrics.
+"""
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone covers every client
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Brotli's top qualities are far too slow per request; 4 compresses better than gzip -6 at similar cost
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Pick our preferred encoding among those the Accept-Encoding header allows."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+class GzipEncoder:
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush so every streamed chunk can be decoded as soon as it arrives
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) + self._brotli.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._brotli.process(data) + self._brotli.finish()
+
+ENCODERS = {"gzip": GzipEncoder, "br": BrotliEncoder}
+
+class CompressionStats:
+    def __init__(self):
+        self.responses = {}  # encoding -> [responses, bytes in, bytes out]
+        self.too_small = 0
+        self.not_accepted = 0
+
+    def observe(self, encoding: str, bytes_in: int, bytes_out: int):
+        entry = self.responses.setdefault(encoding, [0, 0, 0])
+        entry[0] += 1
+        entry[1] += bytes_in
+        entry[2] += bytes_out
+
+    def summary(self) -> dict:
+        bytes_in = sum(e[1] for e in self.responses.values())
+        bytes_out = sum(e[2] for e in self.responses.values())
+        return {
+            "encodings": {k: {"responses": n, "bytesIn": i, "bytesOut": o} for k, (n, i, o) in self.responses.items()},
+            "bytesSaved": bytes_in - bytes_out,
+            "ratio": round(bytes_out / bytes_in, 3) if bytes_in else 1.0,
+            "tooSmall": self.too_small,
+            "notAccepted": self.not_accepted,
+        }
+
+    def prometheus_lines(self) -> list:
+        lines = ["# HELP royalbee_http_compressed_responses_total Responses sent compressed, by encoding.",
+                 "# TYPE royalbee_http_compressed_responses_total counter"]
+        lines += [f'royalbee_http_compressed_responses_total{{encoding="{k}"}} {e[0]}' for k, e in sorted(self.responses.items())]
+        lines += ["# HELP royalbee_http_compression_input_bytes_total Body bytes before compression, by encoding.",
+                  "# TYPE royalbee_http_compression_input_bytes_total counter"]
+        lines += [f'royalbee_http_compression_input_bytes_total{{encoding="{k}"}} {e[1]}' for k, e in sorted(self.responses.items())]
+        lines += ["# HELP royalbee_http_compression_output_bytes_total Body bytes sent after compression, by encoding.",
+                  "# TYPE royalbee_http_compression_output_bytes_total counter"]
+        lines += [f'royalbee_http_compression_output_bytes_total{{encoding="{k}"}} {e[2]}' for k, e in sorted(self.responses.items())]
+        return lines
+
+stats = CompressionStats()
+
+def cached_variant(request, body: bytes, variants: dict) -> tuple:
+    """(body, encoding) to send for `body`, compressing into `variants` on first use of an encoding."""
+    encoding = None
+    if COMPRESSION_ENABLED and request.method != "HEAD" and len(body) >= COMPRESSION_MIN_BYTES:
+        encoding = negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is None:
+        return body, None
+    data = variants.get(encoding)
+    if data is None:
+        data = variants[encoding] = ENCODERS[encoding]().finish(body)
+    stats.observe(encoding, len(body), len(data))
+    return data, encoding
+
+def _compressible(headers: Headers, status: int) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def _weaken_etag(headers: MutableHeaders):
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+class CompressionMiddleware:
+    """Plain ASGI middleware, so streaming responses are compressed as they stream."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            return await self.app(scope, receive, send)
+        encoding = None
+        if scope["method"] != "HEAD":
+            encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        encoder = None
+        passthrough = False
+        bytes_in = bytes_out = 0
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough, bytes_in, bytes_out
+            if message["type"] == "http.response.start":
+                start = message  # held back until the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start)
+                if start["status"] == 304 and encoding is not None:
+                    # Revalidation of a variant we would have compressed: same Vary, same weak tag
+                    headers.add_vary_header("Accept-Encoding")
+                    _weaken_etag(headers)
+                if not _compressible(headers, start["status"]):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                # The representation depends on Accept-Encoding whether or not this one is compressed
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None or (not more and len(body) < self.minimum_size):
+                    if encoding is None:
+                        stats.not_accepted += 1
+                    else:
+                        stats.too_small += 1
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                encoder = ENCODERS[encoding]()
+                headers["Content-Encoding"] = encoding
+                _weaken_etag(headers)
+                if more:
+                    del headers["Content-Length"]
+                    data = encoder.compress(body)
+                else:
+                    data = encoder.finish(body)
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+            else:
+                data = encoder.compress(body) if more else encoder.finish(body)
+            bytes_in += len(body)
+            bytes_out += len(data)
+            if not more:
+                stats.observe(encoding, bytes_in, bytes_out)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,93 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+# Conditional GET helpers: tag a JSON body with ETag/Last-Modified and answer 304
+# when the client already holds the same representation. CachePolicyMiddleware adds
+# the Cache-Control that lets browsers and a CDN reuse those representations.
+
+# Public catalog reads may be served from a cache this long, then served stale for up to
+# CATALOG_STALE_WHILE_REVALIDATE more while the cache revalidates with the ETag
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "60"))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "300"))
+
+PUBLIC_CATALOG = f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}"
+NO_STORE = "no-store"
+
+# Route template -> Cache-Control for successful GETs. Anything else, including every
+# authenticated or per-user route, errors and writes, is no-store.
+CACHE_POLICIES = {
+    "/": "public, max-age=3600",
+    "/products": PUBLIC_CATALOG,
+    "/products/search": PUBLIC_CATALOG,
+    "/products/{product_id}/price-history": PUBLIC_CATALOG,
+}
+
+def make_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def conditional_response(
+    request: Request, body: bytes, etag: str, last_modified: datetime | None = None, content_encoding: str | None = None
+) -> Response:
+    """`content_encoding` marks `body` as already compressed, see compression.cached_variant."""
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    if content_encoding is not None:
+        headers.update({"ETag": f"W/{etag}", "Content-Encoding": content_encoding, "Vary": "Accept-Encoding"})
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cache_control(method: str, route: str | None, status: int) -> str:
+    if method in ("GET", "HEAD") and status in (200, 304) and route in CACHE_POLICIES:
+        return CACHE_POLICIES[route]
+    return NO_STORE
+
+class CachePolicyMiddleware:
+    """Sets Cache-Control from CACHE_POLICIES on responses that don't set their own."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" not in headers:
+                    # The router has matched by now, so the route template is known
+                    route = getattr(scope.get("route"), "path", None)
+                    headers["Cache-Control"] = cache_control(scope["method"], route, message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,56 +1,362 @@
-from sqlalchemy.orm import Session, joinedload
-from . import models, schemas
-from .auth import hash_password, verify_password
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from . import models, schemas, aggregates, pricing, search, history
+from .auth import hash_password, verify_password, needs_rehash, hash_pool, invalidate_user
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).where(models.User.email == email))
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = hash_password(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    # bcrypt is CPU bound; run it in the hash process pool
+    hashed_password = await hash_pool.run(hash_password, user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password, name=user.name)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await aggregates.bump(db, users=1)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if not user or not await hash_pool.run(verify_password, password, user.hashed_password):
         return None
+    if needs_rehash(user.hashed_password):
+        # Work factor changed since this hash was made; upgrade it while we have the password
+        user.hashed_password = await hash_pool.run(hash_password, password)
+        await db.commit()
     return user
 
-def get_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).options(joinedload(models.Product.retailers)).offset(skip).limit(limit).all()
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.scalars(
+        select(models.Product).options(selectinload(models.Product.offers)).order_by(models.Product.id).offset(skip).limit(limit)
+    )
+    return result.all()
+
+async def get_products_after(db: AsyncSession, cursor: int = 0, limit: int = 100):
+    # Keyset pagination: seek past the last id the client saw instead of scanning an offset
+    result = await db.scalars(
+        select(models.Product)
+        .options(selectinload(models.Product.offers))
+        .where(models.Product.id > cursor)
+        .order_by(models.Product.id)
+        .limit(limit)
+    )
+    return result.all()
+
+async def get_product(db: AsyncSession, product_id: int):
+    return await db.scalar(
+        select(models.Product).options(selectinload(models.Product.offers)).where(models.Product.id == product_id)
+    )
+
+async def search_products(db: AsyncSession, q: str, category: str | None = None, limit: int = 20, offset: int = 0):
+    fts = search.enabled(db)
+    products = await db.scalars(
+        search.search_statement(q, category, limit, offset, fts=fts).options(selectinload(models.Product.offers))
+    )
+    facets = (await db.execute(search.facet_statement(q, fts=fts))).all()
+    return schemas.ProductSearchResult(
+        items=[schemas.ProductOut.model_validate(p) for p in products.all()],
+        facets=[schemas.CategoryFacet(category=name, count=count) for name, count in facets],
+        total=sum(count for name, count in facets if category is None or name == category),
+    )
+
+async def update_offer_price(db: AsyncSession, offer_id: int, price: float):
+    offer = await db.get(models.Offer, offer_id)
+    if offer is None:
+        return None
+    offer.price = price
+    await db.flush()
+    await history.record(db, {offer.id: price})
+    await pricing.refresh_best_offers(db, [offer.product_id])
+    # Touch the product so catalog pages pick up a new Last-Modified
+    await db.execute(
+        update(models.Product).where(models.Product.id == offer.product_id).values(updated_at=datetime.utcnow())
+    )
+    await db.commit()
+    return offer
+
+async def get_price_history(db: AsyncSession, product_id: int, start: datetime, end: datetime, resolution: str = "auto"):
+    if await db.scalar(select(models.Product.id).where(models.Product.id == product_id)) is None:
+        return None
+    return await history.product_history(db, product_id, start, end, resolution)
+
+async def compare_basket(db: AsyncSession, basket: schemas.BasketRequest):
+    lines = defaultdict(int)
+    for line in basket.items:
+        lines[line.product_id] += line.quantity
+    offers = await pricing.load_offers(db, list(lines))
+    return pricing.optimize_basket(lines, offers)
+
+def _cart_changes(operations):
+    # Collapse the batch to the final quantity per line; 0 means remove
+    final = {}
+    for op in operations:
+        final[(op.product_id, op.retailer_id)] = 0 if op.op == "remove" else op.quantity
+    return final
+
+async def _offers(db: AsyncSession, offer_ids):
+    rows = await db.execute(
+        select(models.Offer.id, models.Offer.product_id, models.Offer.price).where(models.Offer.id.in_(offer_ids))
+    )
+    return {offer_id: (product_id, price) for offer_id, product_id, price in rows}
+
+async def unknown_cart_offers(db: AsyncSession, operations):
+    wanted = [key for key, quantity in _cart_changes(operations).items() if quantity]
+    offers = await _offers(db, {retailer_id for _, retailer_id in wanted})
+    return [key for key in wanted if offers.get(key[1], (None,))[0] != key[0]]
+
+async def _priced_cart(db: AsyncSession, user_id: int) -> schemas.CartOut:
+    rows = (await db.execute(
+        select(
+            models.CartItem.id, models.CartItem.product_id, models.CartItem.retailer_id, models.CartItem.quantity,
+            models.CartItem.price, models.Offer.product_id.label("offer_product_id"), models.Offer.price.label("current_price"),
+            models.Product.name.label("product_name"), models.Store.name.label("retailer"),
+        )
+        .outerjoin(models.Offer, models.Offer.id == models.CartItem.retailer_id)
+        .outerjoin(models.Store, models.Store.id == models.Offer.store_id)
+        .outerjoin(models.Product, models.Product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )).all()
+    lines, repriced = [], []
+    for row in rows:
+        available = row.current_price is not None and row.offer_product_id == row.product_id
+        changed = available and row.price != row.current_price
+        if changed:
+            repriced.append({"id": row.id, "price": row.current_price})
+        unit_price = row.current_price if available else None
+        lines.append(schemas.CartLine(
+            product_id=row.product_id,
+            retailer_id=row.retailer_id,
+            product_name=row.product_name,
+            retailer=row.retailer,
+            quantity=row.quantity,
+            unit_price=unit_price,
+            line_total=round(unit_price * row.quantity, 2) if available else 0.0,
+            previous_price=row.price if changed else None,
+            price_changed=changed,
+            available=available,
+        ))
+    if repriced:
+        # Remember the price the user has now been shown, so it is flagged only once
+        await db.execute(update(models.CartItem), repriced)  # bulk UPDATE by primary key
+    return schemas.CartOut(items=lines, total=round(sum(line.line_total for line in lines), 2), repriced=len(repriced))
+
+async def get_cart(db: AsyncSession, user_id: int) -> schemas.CartOut:
+    cart = await _priced_cart(db, user_id)
+    await db.commit()
+    return cart
+
+async def sync_cart(db: AsyncSession, user_id: int, operations) -> schemas.CartOut:
+    # The whole batch is one transaction; callers check unknown_cart_offers first
+    changes = _cart_changes(operations)
+    keep = {key: quantity for key, quantity in changes.items() if quantity}
+    drop = [key for key, quantity in changes.items() if not quantity]
+    if keep:
+        offers = await _offers(db, {retailer_id for _, retailer_id in keep})
+        stmt = aggregates.upsert(db, models.CartItem)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "product_id", "retailer_id"],
+            set_={"quantity": stmt.excluded.quantity, "price": stmt.excluded.price},
+        )
+        await db.execute(stmt, [
+            {"user_id": user_id, "product_id": product_id, "retailer_id": retailer_id, "quantity": quantity,
+             "price": offers[retailer_id][1]}
+            for (product_id, retailer_id), quantity in keep.items()
+        ])
+    if drop:
+        await db.execute(
+            delete(models.CartItem).where(
+                models.CartItem.user_id == user_id,
+                tuple_(models.CartItem.product_id, models.CartItem.retailer_id).in_(drop),
+            )
+        )
+    cart = await _priced_cart(db, user_id)
+    await db.commit()
+    return cart
+
+async def clear_cart(db: AsyncSession, user_id: int):
+    await db.execute(delete(models.CartItem).where(models.CartItem.user_id == user_id))
+    await db.commit()
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
+    db_product = models.Product(
+        name=product.name,
+        category=product.category,
+        image=product.image,
+        description=product.description,
+        offers=[]
+    )
+    db.add(db_product)
+    await db.flush()
+    await search.index_product(db, db_product)
+    await aggregates.bump(db, products=1)
+    await db.commit()
+    return db_product
+
+async def update_product(db: AsyncSession, db_product: models.Product, product: schemas.ProductCreate):
+    db_product.name = product.name
+    db_product.category = product.category
+    db_product.image = product.image
+    db_product.description = product.description
+    await search.index_product(db, db_product)
+    await db.commit()
+    return db_product
 
-def create_order(db: Session, order: schemas.OrderCreate):
-    db_order = models.Order(
+async def delete_product(db: AsyncSession, db_product: models.Product):
+    # Set-based deletes of everything keyed by the product. Left to the ORM, offers and cart
+    # lines would be orphaned with a NULL product_id, which offers.product_id rejects.
+    # Offer ids get reused, so their price history goes as well.
+    offer_ids = select(models.Offer.id).where(models.Offer.product_id == db_product.id).scalar_subquery()
+    for model in (models.PriceObservation, models.DailyPriceRollup, models.WeeklyPriceRollup):
+        await db.execute(delete(model).where(model.offer_id.in_(offer_ids)))
+    await db.execute(delete(models.CartItem).where(models.CartItem.product_id == db_product.id))
+    await db.execute(delete(models.Offer).where(models.Offer.product_id == db_product.id))
+    await search.unindex_product(db, db_product.id)
+    await db.execute(delete(models.Product).where(models.Product.id == db_product.id))
+    await aggregates.bump(db, products=-1)
+    await db.commit()
+
+async def add_order(db: AsyncSession, order: schemas.OrderCreate):
+    """Write an order without committing; returns the response and the email whose cached principal is now stale."""
+    # Constant statement count per order: one INSERT for the order, one executemany for its
+    # items and one in-place UPDATE of the user's points.
+    order_id = await db.scalar(
+        insert(models.Order)
+        .values(user_id=order.user_id, date=order.date, total=order.total, payment=order.payment, address=order.address)
+        .returning(models.Order.id)
+    )
+    item_rows = [{"order_id": order_id, **item.model_dump()} for item in order.items]
+    item_ids = []
+    if item_rows:
+        # One multi-row INSERT ... RETURNING, no read-back. PostgreSQL returns the ids in
+        # parameter order. SQLite has no sentinel for that and would go row by row, but its
+        # rowids ascend in VALUES order while we hold the write lock, so sorting them is enough.
+        stmt = insert(models.OrderItem.__table__)
+        if db.bind.dialect.name == "postgresql":
+            item_ids = (await db.scalars(stmt.returning(models.OrderItem.id, sort_by_parameter_order=True), item_rows)).all()
+        else:
+            item_ids = sorted((await db.scalars(stmt.returning(models.OrderItem.id), item_rows)).all())
+    # Award points: 2 points for every 10 euros spent, added server-side so concurrent orders don't race
+    points_awarded = int(order.total // 10) * 2
+    email = None
+    if points_awarded:
+        email = await db.scalar(
+            update(models.User)
+            .where(models.User.id == order.user_id)
+            .values(points=func.coalesce(models.User.points, 0) + points_awarded)
+            .returning(models.User.email)
+        )
+    await aggregates.record_order(db, order)
+    return schemas.OrderCreated(
+        id=order_id,
         user_id=order.user_id,
         date=order.date,
         total=order.total,
         payment=order.payment,
-        address=order.address
-    )
-    db.add(db_order)
-    db.flush()     # To get db_order.id before adding items
-    for item in order.items:
-        db_item = models.OrderItem(
-            order_id=db_order.id,
-            product_name=item.product_name,
-            quantity=item.quantity,
-            retailer=item.retailer,
-            price=item.price
-        )
-        db.add(db_item)
-    # Award points: 2 points for every 10 euros spent
-    user = db.query(models.User).filter(models.User.id == order.user_id).first()
-    if user:
-        points_awarded = int(order.total // 10) * 2
-        user.points = (user.points or 0) + points_awarded
-    db.commit()
-    db.refresh(db_order)
-    # Optionally, return points_awarded for frontend display
-    # return db_order, points_awarded
-    return db_order
-
-def get_orders_by_user(db: Session, user_id: int):
-    return db.query(models.Order).options(joinedload(models.Order.items)).filter(models.Order.user_id == user_id).all()
+        address=order.address,
+        items=[schemas.OrderItemOut(id=item_id, **row) for item_id, row in zip(item_ids, item_rows)],
+        points_awarded=points_awarded if email is not None else 0,
+    ), email
+
+async def create_order(db: AsyncSession, order: schemas.OrderCreate):
+    created, email = await add_order(db, order)
+    await db.commit()
+    if email is not None:
+        invalidate_user(order.user_id, email)
+    return created
+
+def user_orders_query(user_id: int, start: datetime | None = None, end: datetime | None = None, columns=None):
+    # `columns` selects a plain projection instead of Order entities with their items
+    query = select(*columns) if columns else select(models.Order).options(selectinload(models.Order.items))
+    query = query.where(models.Order.user_id == user_id)
+    # Bounds on (user_id, date) turn this into a range scan of ix_orders_user_id_date
+    if start is not None:
+        query = query.where(models.Order.date >= start)
+    if end is not None:
+        query = query.where(models.Order.date < end)
+    return query.order_by(models.Order.date)
+
+async def get_orders_by_user(db: AsyncSession, user_id: int, start: datetime | None = None, end: datetime | None = None):
+    result = await db.scalars(user_orders_query(user_id, start, end))
+    return result.all()
+
+def _order_bucket(db, granularity: str):
+    if db.bind.dialect.name == "postgresql":
+        return func.date_trunc(granularity, models.Order.date)
+    if granularity == "week":
+        # Monday of the order's week
+        return func.date(models.Order.date, "weekday 0", "-6 days")
+    if granularity == "month":
+        return func.strftime("%Y-%m-01", models.Order.date)
+    return func.date(models.Order.date)
+
+async def get_order_report(db: AsyncSession, start: datetime, end: datetime, granularity: str = "day", user_id: int | None = None):
+    bucket = _order_bucket(db, granularity).label("bucket")
+    query = (
+        select(bucket, func.count(models.Order.id), func.coalesce(func.sum(models.Order.total), 0))
+        .where(models.Order.date >= start, models.Order.date < end)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    if user_id is not None:
+        query = query.where(models.Order.user_id == user_id)
+    rows = (await db.execute(query)).all()
+    return schemas.OrderReport(
+        granularity=granularity,
+        buckets=[schemas.OrderBucket(start=str(value)[:10], orders=count, revenue=total) for value, count, total in rows],
+    )
+
+def open_orders_query(cursor: int = 0, limit: int = 50, status: str | None = None):
+    # Served from the partial index ix_orders_open, so only open orders are read
+    query = (
+        select(models.Order.id, models.Order.user_id, models.Order.total, models.Order.date, models.Order.status)
+        .where(models.order_is_open(), models.Order.id > cursor)
+        .order_by(models.Order.id)
+        .limit(limit)
+    )
+    if status is not None:
+        query = query.where(models.Order.status == status)
+    return query
+
+async def get_open_orders(db: AsyncSession, cursor: int = 0, limit: int = 50, status: str | None = None):
+    rows = (await db.execute(open_orders_query(cursor, limit, status))).all()
+    items = [
+        schemas.OpenOrder(id=row.id, customer=row.user_id, total=row.total, date=row.date, status=row.status)
+        for row in rows
+    ]
+    next_cursor = items[-1].id if items and len(items) == limit else None
+    return schemas.OpenOrderPage(items=items, next_cursor=next_cursor)
+
+async def transition_orders(db: AsyncSession, order_ids: list[int], new_status: str):
+    current = (await db.execute(
+        select(models.Order.id, models.Order.status).where(models.Order.id.in_(order_ids))
+    )).all()
+    by_status = defaultdict(list)
+    for order_id, status in current:
+        if new_status in models.ORDER_TRANSITIONS.get(status, ()):
+            by_status[status].append(order_id)
+    updated = []
+    open_delta = 0
+    for old_status, ids in by_status.items():
+        # Re-check the old status in the UPDATE so a concurrent transition can't be applied twice
+        changed = (await db.scalars(
+            update(models.Order)
+            .where(models.Order.id.in_(ids), models.Order.status == old_status)
+            .values(status=new_status)
+            .returning(models.Order.id)
+        )).all()
+        updated.extend(changed)
+        open_delta += len(changed) * ((new_status in models.OPEN_ORDER_STATUSES) - (old_status in models.OPEN_ORDER_STATUSES))
+    if open_delta:
+        await aggregates.bump(db, open_orders=open_delta)
+    await db.commit()
+    updated_set = set(updated)
+    return schemas.OrderStatusResult(
+        status=new_status,
+        updated=sorted(updated),
+        skipped=[order_id for order_id in order_ids if order_id not in updated_set],
+    )
@@ -1,18 +1,214 @@
-from sqlalchemy import create_engine
+import itertools
+import os
+import threading
+import time
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./royalbee.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./royalbee.db")
+# Read replicas, comma separated: copies of the primary kept current by replication (a
+# Postgres hot standby, or a SQLite file maintained by Litestream/LiteFS). Routes that
+# declare read intent spread across them; without any, reads go to the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a client writes, its reads stay on the primary this long so replica lag can't hide the write
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Storage profile. "production" puts SQLite in WAL mode with the pragmas below so readers
+# never block on the writer and writers wait for the lock instead of failing with
+# "database is locked"; "default" leaves SQLite's own settings untouched.
+STORAGE_PROFILE = os.getenv("STORAGE_PROFILE", "production")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative means KiB, i.e. 64 MiB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Async drivers used by the request path; scripts, seeding and Alembic keep the sync engine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme.split("+")[0], scheme) + sep + rest
+
+def sqlite_pragmas(profile: str = STORAGE_PROFILE) -> dict:
+    if profile != "production":
+        return {}
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": SQLITE_CACHE_SIZE,
+        "mmap_size": SQLITE_MMAP_SIZE,
+    }
+
+def _engine_options(url: str, profile: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+    options = {"connect_args": {"check_same_thread": False}}
+    if profile == "production":
+        # Let the driver wait on a locked database as long as SQLite itself would
+        options["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+    if ":memory:" not in url:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def _apply_pragmas(sync_engine, pragmas: dict):
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = STORAGE_PROFILE):
+    engine = create_engine(url, **_engine_options(url, profile))
+    if url.startswith("sqlite"):
+        _apply_pragmas(engine, sqlite_pragmas(profile))
+    return engine
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = STORAGE_PROFILE):
+    engine = create_async_engine(to_async_url(url), **_engine_options(url, profile))
+    if url.startswith("sqlite"):
+        _apply_pragmas(engine.sync_engine, sqlite_pragmas(profile))
+    return engine
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# Set on a client that just wrote; a cookie rather than server state, so it holds
+# whichever worker or instance serves the client's next request
+STICKY_COOKIE = "rb_read_primary"
+
+class SessionRouter:
+    """Hands out sessions by intent: writes on the primary, reads round-robin over replicas."""
+
+    def __init__(self, primary, replicas):
+        self.primary = primary
+        self.replicas = replicas
+        self._next_replica = itertools.cycle(replicas) if replicas else None
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self.sticky_reads = 0
+
+    def writer(self):
+        return self.primary()
+
+    def reader(self, sticky: bool = False):
+        if self._next_replica is None:
+            self.primary_reads += 1
+            return self.primary()
+        if sticky:
+            self.sticky_reads += 1
+            return self.primary()
+        self.replica_reads += 1
+        return next(self._next_replica)()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": len(self.replicas),
+            "primaryReads": self.primary_reads,
+            "replicaReads": self.replica_reads,
+            "stickyReads": self.sticky_reads,
+        }
+
+class Engines:
+    """One process's engines, session factories and router.
+
+    Built on first use rather than at import: a preforking server (gunicorn --preload)
+    imports the app once and forks its workers, and pooled connections must not be shared
+    between processes. A process that finds engines built before it was forked drops them
+    without closing the parent's connections and builds its own.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.engine = make_engine()
+        self.session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = make_async_engine()
+        # expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+        self.async_session = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.replica_engines = [make_async_engine(url) for url in DATABASE_REPLICA_URLS]
+        self.router = SessionRouter(
+            self.async_session,
+            [async_sessionmaker(engine, autoflush=False, expire_on_commit=False) for engine in self.replica_engines],
+        )
+
+    def all(self) -> list:
+        """Every sync Engine, including the ones under the async engines."""
+        return [self.engine, self.async_engine.sync_engine] + [e.sync_engine for e in self.replica_engines]
+
+    def abandon(self):
+        # close=False: the pooled connections belong to the parent process
+        for engine in self.all():
+            engine.dispose(close=False)
+
+_engines = None
+_engines_lock = threading.Lock()
+_engine_hooks = []
+
+def engines() -> Engines:
+    global _engines
+    current = _engines
+    if current is not None and current.pid == os.getpid():
+        return current
+    with _engines_lock:
+        if _engines is None or _engines.pid != os.getpid():
+            if _engines is not None:
+                _engines.abandon()
+            _engines = Engines()
+            for hook in _engine_hooks:
+                hook(_engines)
+        return _engines
+
+def on_engines_created(hook):
+    """Call `hook(engines)` for every process's engines, e.g. to instrument them."""
+    _engine_hooks.append(hook)
+    if _engines is not None and _engines.pid == os.getpid():
+        hook(_engines)
+
+async def dispose():
+    if _engines is not None and _engines.pid == os.getpid():
+        await _engines.async_engine.dispose()
+        for replica in _engines.replica_engines:
+            await replica.dispose()
+        _engines.engine.dispose()
+
+# Session factories under their old sessionmaker names, for scripts and background tasks
+def SessionLocal():
+    return engines().session()
+
+def AsyncSessionLocal():
+    return engines().async_session()
+
+def read_your_writes(response: Response):
+    """Pin the client's reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    until = int(time.time()) + READ_YOUR_WRITES_SECONDS
+    response.set_cookie(STICKY_COOKIE, str(until), max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax")
+
+def is_sticky(request: Request) -> bool:
     try:
+        return int(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+async def get_write_db():
+    async with engines().router.writer() as db:
+        yield db
+
+# Routes that write, or must see their own writes, depend on get_db
+get_db = get_write_db
+
+async def get_read_db(request: Request):
+    async with engines().router.reader(sticky=is_sticky(request)) as db:
         yield db
-    finally:
-        db.close()
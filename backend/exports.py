@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from . import models
+from .database import engines
+
+# Rows fetched per round-trip and written per response chunk
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Explicit projections: exports never load whole ORM objects and never include hashed_password
+USER_COLUMNS = (
+    models.User.id, models.User.username, models.User.email, models.User.name, models.User.role, models.User.points,
+)
+ORDER_COLUMNS = (
+    models.Order.id, models.Order.user_id, models.Order.date, models.Order.total, models.Order.payment, models.Order.address,
+    models.Order.status,
+)
+
+def users_query(role: str | None = None):
+    query = select(*USER_COLUMNS).order_by(models.User.id)
+    if role is not None:
+        query = query.where(models.User.role == role)
+    return query
+
+def orders_query(start: datetime | None = None, end: datetime | None = None, user_id: int | None = None):
+    query = select(*ORDER_COLUMNS).order_by(models.Order.id)
+    if start is not None:
+        query = query.where(models.Order.date >= start)
+    if end is not None:
+        query = query.where(models.Order.date < end)
+    if user_id is not None:
+        query = query.where(models.Order.user_id == user_id)
+    return query
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="milliseconds") + "Z"
+    return value
+
+def _encode(fields, rows, fmt: str) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_value(v) for v in row] for row in rows)
+        return buffer.getvalue()
+    return "".join(json.dumps({k: _value(v) for k, v in zip(fields, row)}) + "\n" for row in rows)
+
+async def stream_rows(query, fmt: str):
+    # The generator owns its session: it keeps reading after the request's dependencies are gone.
+    # Exports are the heaviest reads we serve, so they go to a replica when there is one.
+    fields = [c.name for c in query.selected_columns]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(fields)
+        yield buffer.getvalue()
+    async with engines().router.reader() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            yield _encode(fields, rows, fmt)
+
+def export_response(query, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
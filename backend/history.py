@@ -0,0 +1,218 @@
+"""Offer price history.
+
+Every price write appends an observation (offer, unix time, price in pence) to
+price_observations and folds it into that offer's daily and weekly rollups, in the same
+transaction. Charts over long ranges read the rollups, so a multi-year series is a short
+primary-key range scan per offer however many observations sit underneath.
+`rebuild` recomputes the rollups from the observations:
+
+    python -m backend.history rebuild
+"""
+import calendar
+import os
+import sys
+from datetime import datetime, timezone
+from sqlalchemy import select, delete, insert, update, func, case, bindparam
+from sqlalchemy.orm import Session
+from . import models, schemas, aggregates
+
+DAY = 86400
+WEEK = 7 * DAY
+# Unix time 0 was a Thursday; shift so weekly buckets start on Monday like the order reports
+WEEK_SHIFT = 3 * DAY
+
+ROLLUPS = {"day": (models.DailyPriceRollup, DAY), "week": (models.WeeklyPriceRollup, WEEK)}
+RESOLUTIONS = ("raw", "day", "week")
+# "auto" serves raw observations up to this span, then the finest rollup within HISTORY_MAX_POINTS
+HISTORY_RAW_DAYS = int(os.getenv("HISTORY_RAW_DAYS", "7"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "400"))
+# Longest span raw observations are served for when asked explicitly
+HISTORY_RAW_MAX_DAYS = int(os.getenv("HISTORY_RAW_MAX_DAYS", "31"))
+
+REBUILD_CHUNK_ROWS = 20000
+
+def to_pence(price: float) -> int:
+    return round(price * 100)
+
+def epoch(value: datetime) -> int:
+    # Naive datetimes are UTC throughout the app
+    return calendar.timegm(value.utctimetuple())
+
+def from_epoch(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+def bucket_start(seconds: int, width: int) -> int:
+    shift = WEEK_SHIFT if width == WEEK else 0
+    return seconds - (seconds + shift) % width
+
+def _least_greatest(db):
+    # SQLite's two-argument min()/max() are scalar; PostgreSQL spells them least/greatest
+    if db.bind.dialect.name == "postgresql":
+        return func.least, func.greatest
+    return func.min, func.max
+
+def observation_statements(db, prices: dict, observed_at: datetime, replaced=()):
+    """(statement, rows) pairs recording {offer_id: price} as observed at `observed_at`.
+
+    `replaced` holds offers that already have an observation in that second. Their new
+    price overwrites it, so their buckets are recomputed rather than incremented.
+    """
+    at = epoch(observed_at)
+    pence = {offer_id: to_pence(price) for offer_id, price in prices.items() if price is not None}
+    if not pence:
+        return
+    stmt = aggregates.upsert(db, models.PriceObservation)
+    yield stmt.on_conflict_do_update(index_elements=["offer_id", "observed_at"], set_={"price": stmt.excluded.price}), [
+        {"offer_id": offer_id, "observed_at": at, "price": price} for offer_id, price in pence.items()
+    ]
+    added = {offer_id: price for offer_id, price in pence.items() if offer_id not in replaced}
+    least, greatest = _least_greatest(db)
+    for model, width in ROLLUPS.values():
+        if added:
+            stmt = aggregates.upsert(db, model)
+            yield stmt.on_conflict_do_update(
+                index_elements=["offer_id", "bucket"],
+                set_={
+                    "low": least(model.low, stmt.excluded.low),
+                    "high": greatest(model.high, stmt.excluded.high),
+                    "total": model.total + stmt.excluded.total,
+                    "samples": model.samples + stmt.excluded.samples,
+                    "close": case((stmt.excluded.closed_at >= model.closed_at, stmt.excluded.close), else_=model.close),
+                    "closed_at": greatest(model.closed_at, stmt.excluded.closed_at),
+                },
+            ), [
+                {"offer_id": offer_id, "bucket": bucket_start(at, width), "low": price, "high": price, "total": price,
+                 "samples": 1, "close": price, "closed_at": at}
+                for offer_id, price in added.items()
+            ]
+        rows = [{"b_offer_id": offer_id, "b_bucket": bucket_start(at, width)} for offer_id in pence if offer_id in replaced]
+        if rows:
+            yield _recompute_statement(model, width), rows
+
+def _recompute_statement(model, width: int):
+    # Rebuild one bucket from its observations; bound per row as b_offer_id, b_bucket.
+    # Core table rather than the entity, so a parameter list runs as a plain executemany.
+    rollup = model.__table__
+    obs = models.PriceObservation
+    in_bucket = (obs.offer_id == rollup.c.offer_id, obs.observed_at >= rollup.c.bucket, obs.observed_at < rollup.c.bucket + width)
+    return (
+        update(rollup)
+        .where(rollup.c.offer_id == bindparam("b_offer_id"), rollup.c.bucket == bindparam("b_bucket"))
+        .values(
+            low=select(func.min(obs.price)).where(*in_bucket).scalar_subquery(),
+            high=select(func.max(obs.price)).where(*in_bucket).scalar_subquery(),
+            total=select(func.sum(obs.price)).where(*in_bucket).scalar_subquery(),
+            samples=select(func.count()).where(*in_bucket).scalar_subquery(),
+            close=select(obs.price).where(*in_bucket).order_by(obs.observed_at.desc()).limit(1).scalar_subquery(),
+            closed_at=select(func.max(obs.observed_at)).where(*in_bucket).scalar_subquery(),
+        )
+    )
+
+async def record(db, prices: dict, observed_at: datetime | None = None):
+    observed_at = observed_at or datetime.utcnow()
+    obs = models.PriceObservation
+    # A second write in the same second replaces that observation (the last price wins)
+    replaced = set((await db.scalars(
+        select(obs.offer_id).where(obs.offer_id.in_(list(prices)), obs.observed_at == epoch(observed_at))
+    )).all())
+    for stmt, rows in observation_statements(db, prices, observed_at, replaced):
+        await db.execute(stmt, rows)
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    days = (end - start).total_seconds() / DAY
+    if days <= HISTORY_RAW_DAYS:
+        return "raw"
+    return "day" if days <= HISTORY_MAX_POINTS else "week"
+
+def _price(pence: int | None) -> float | None:
+    return None if pence is None else pence / 100
+
+async def product_history(db, product_id: int, start: datetime, end: datetime, resolution: str = "auto") -> schemas.PriceHistory:
+    if resolution == "auto":
+        resolution = pick_resolution(start, end)
+    lo, hi = epoch(start), epoch(end) + (end.microsecond > 0)
+    # The price in force when the range opens, so flat series still chart
+    opening = (
+        select(models.PriceObservation.price)
+        .where(models.PriceObservation.offer_id == models.Offer.id, models.PriceObservation.observed_at < lo)
+        .order_by(models.PriceObservation.observed_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    offers = (await db.execute(
+        select(models.Offer.id, models.Offer.store_id, models.Store.name, opening.label("opening"))
+        .join(models.Store, models.Store.id == models.Offer.store_id)
+        .where(models.Offer.product_id == product_id)
+        .order_by(models.Offer.id)
+    )).all()
+    points = {offer.id: [] for offer in offers}
+    if offers:
+        if resolution == "raw":
+            obs = models.PriceObservation
+            for offer_id, at, price in await db.execute(
+                select(obs.offer_id, obs.observed_at, obs.price)
+                .where(obs.offer_id.in_(points), obs.observed_at >= lo, obs.observed_at < hi)
+                .order_by(obs.offer_id, obs.observed_at)
+            ):
+                value = price / 100
+                points[offer_id].append(
+                    schemas.PricePoint(start=from_epoch(at), low=value, high=value, average=value, close=value, samples=1)
+                )
+        else:
+            model, width = ROLLUPS[resolution]
+            for row in await db.execute(
+                select(model.offer_id, model.bucket, model.low, model.high, model.total, model.samples, model.close)
+                .where(model.offer_id.in_(points), model.bucket >= bucket_start(lo, width), model.bucket < hi)
+                .order_by(model.offer_id, model.bucket)
+            ):
+                points[row.offer_id].append(schemas.PricePoint(
+                    start=from_epoch(row.bucket), low=row.low / 100, high=row.high / 100,
+                    average=round(row.total / row.samples) / 100, close=row.close / 100, samples=row.samples,
+                ))
+    return schemas.PriceHistory(
+        product_id=product_id,
+        resolution=resolution,
+        start=start,
+        end=end,
+        series=[
+            schemas.PriceSeries(retailer_id=offer.id, store_id=offer.store_id, retailer=offer.name,
+                                opening=_price(offer.opening), points=points[offer.id])
+            for offer in offers
+        ],
+    )
+
+def rebuild(db: Session):
+    """Recompute both rollup tables from price_observations, streaming in key order."""
+    for model, width in ROLLUPS.values():
+        db.execute(delete(model))
+        rows, current = [], None
+        obs = models.PriceObservation
+        result = db.execute(
+            select(obs.offer_id, obs.observed_at, obs.price).order_by(obs.offer_id, obs.observed_at),
+            execution_options={"yield_per": REBUILD_CHUNK_ROWS},
+        )
+        for offer_id, at, price in result:
+            key = (offer_id, bucket_start(at, width))
+            if current is None or current["offer_id"] != key[0] or current["bucket"] != key[1]:
+                current = {"offer_id": key[0], "bucket": key[1], "low": price, "high": price, "total": 0, "samples": 0}
+                rows.append(current)
+                if len(rows) > REBUILD_CHUNK_ROWS:
+                    # Everything but the still-open bucket is complete
+                    db.execute(insert(model), rows[:-1])
+                    del rows[:-1]
+            current["low"] = min(current["low"], price)
+            current["high"] = max(current["high"], price)
+            current["total"] += price
+            current["samples"] += 1
+            current["close"], current["closed_at"] = price, at
+        if rows:
+            db.execute(insert(model), rows)
+    db.commit()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m backend.history rebuild")
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        rebuild(db)
+    print("Price rollups rebuilt.")
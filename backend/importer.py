@@ -0,0 +1,211 @@
+"""Bulk import of retailer price feeds.
+
+A feed is CSV (with a header row) or NDJSON, one offer per row:
+
+    sku, name, category, store, price[, description, image]
+
+Rows are read lazily and validated a chunk at a time, in a worker thread so the event
+loop keeps serving requests while a large feed is parsed. Each chunk is upserted in a single
+transaction: stores by name, products by sku and offers by (store, product), with
+INSERT ... ON CONFLICT, and every imported price is recorded in the price history. Then
+the best offers, the search index and the catalog cache are refreshed for that chunk.
+Memory stays flat however large the feed is.
+
+    python -m backend.importer feed.csv --batch-size 5000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import select
+from . import models, schemas, aggregates, catalog, history, pricing, search
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+# Rejected rows beyond this are counted but not itemised in the report
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+FORMATS = ("csv", "ndjson")
+
+# Report of the running or most recent import, for progress polling
+latest_report = None
+
+def detect_format(filename: str | None, default: str = "csv") -> str:
+    suffix = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return "ndjson" if suffix in ("ndjson", "jsonl") else "csv" if suffix == "csv" else default
+
+def read_rows(binary, fmt: str):
+    """Yield (line number, raw row) pairs from a binary file object, one line at a time."""
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {k: v if v != "" else None for k, v in row.items() if k is not None}
+        return
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as e:
+            yield line_num, e
+
+def chunked(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class FeedImporter:
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE, max_errors: int = IMPORT_MAX_ERRORS):
+        self.batch_size = batch_size
+        self.report = schemas.ImportReport(batch_size=batch_size, max_errors=max_errors)
+        self._stores = {}
+
+    def _reject(self, line: int, error):
+        self.report.rejected += 1
+        if len(self.report.errors) < self.report.max_errors:
+            self.report.errors.append(schemas.ImportRowError(line=line, error=str(error)))
+
+    def _validate(self, chunk):
+        # Later rows win when a chunk repeats a product or an offer
+        rows = {}
+        for line, raw in chunk:
+            if isinstance(raw, Exception):
+                self._reject(line, raw)
+                continue
+            try:
+                row = schemas.FeedRow.model_validate(raw)
+            except ValidationError as e:
+                self._reject(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            rows[(row.sku, row.store)] = (line, row)
+        return list(rows.values())
+
+    async def _store_ids(self, db, names):
+        missing = [name for name in names if name not in self._stores]
+        new = []
+        if missing:
+            existing = dict((await db.execute(
+                select(models.Store.name, models.Store.id).where(models.Store.name.in_(missing))
+            )).all())
+            new = [name for name in missing if name not in existing]
+            if new:
+                await db.execute(aggregates.upsert(db, models.Store).on_conflict_do_nothing(), [{"name": n} for n in new])
+                existing.update((await db.execute(
+                    select(models.Store.name, models.Store.id).where(models.Store.name.in_(new))
+                )).all())
+                await aggregates.bump(db, stores=len(new))
+            self._stores.update(existing)
+        return self._stores, len(new)
+
+    async def _write(self, db, rows):
+        now = datetime.utcnow()
+        products = {row.sku: row for _, row in rows}
+        skus = list(products)
+        known = set(await db.scalars(select(models.Product.sku).where(models.Product.sku.in_(skus))))
+        stores, stores_created = await self._store_ids(db, {row.store for _, row in rows})
+
+        stmt = aggregates.upsert(db, models.Product)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sku"],
+            set_={
+                "name": stmt.excluded.name,
+                "category": stmt.excluded.category,
+                "description": stmt.excluded.description,
+                "image": stmt.excluded.image,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt, [
+            {"sku": sku, "name": r.name, "category": r.category, "description": r.description, "image": r.image, "updated_at": now}
+            for sku, r in products.items()
+        ])
+        product_ids = dict((await db.execute(
+            select(models.Product.sku, models.Product.id).where(models.Product.sku.in_(skus))
+        )).all())
+
+        stmt = aggregates.upsert(db, models.Offer)
+        stmt = stmt.on_conflict_do_update(index_elements=["store_id", "product_id"], set_={"price": stmt.excluded.price})
+        await db.execute(stmt, [
+            {"product_id": product_ids[row.sku], "store_id": stores[row.store], "price": row.price} for _, row in rows
+        ])
+
+        ids = list(product_ids.values())
+        offer_ids = {(store_id, product_id): offer_id for offer_id, store_id, product_id in await db.execute(
+            select(models.Offer.id, models.Offer.store_id, models.Offer.product_id).where(models.Offer.product_id.in_(ids))
+        )}
+        await history.record(db, {offer_ids[(stores[row.store], product_ids[row.sku])]: row.price for _, row in rows}, now)
+
+        # Derived structures are refreshed once per batch, not once per row
+        await pricing.refresh_best_offers(db, ids)
+        await search.reindex_products(db, ids)
+        created = len(products) - len(known)
+        if created:
+            await aggregates.bump(db, products=created)
+        return created, stores_created
+
+    def _next_batch(self, chunks):
+        # Runs in a worker thread: reading and validating the rows is blocking CPU work
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        self.report.rows += len(chunk)
+        return self._validate(chunk)
+
+    async def run(self, session_factory, rows, progress=None) -> schemas.ImportReport:
+        global latest_report
+        latest_report = self.report
+        started = time.perf_counter()
+        chunks = chunked(rows, self.batch_size)
+        while (valid := await asyncio.to_thread(self._next_batch, chunks)) is not None:
+            if valid:
+                try:
+                    async with session_factory() as db:
+                        products_created, stores_created = await self._write(db, valid)
+                        await db.commit()
+                    self.report.imported += len(valid)
+                    self.report.products_created += products_created
+                    self.report.stores_created += stores_created
+                except Exception as e:
+                    # A failed batch is rolled back whole; report its rows and carry on
+                    self._stores.clear()
+                    for line, _ in valid:
+                        self._reject(line, e)
+                catalog.bump_version()
+            self.report.batches += 1
+            self.report.seconds = round(time.perf_counter() - started, 3)
+            if progress is not None:
+                progress(self.report)
+        return self.report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a CSV or NDJSON price feed.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    fmt = args.format or detect_format(args.path)
+    from .database import AsyncSessionLocal
+
+    def progress(report):
+        print(f"batch {report.batches}: {report.rows} rows, {report.imported} imported, "
+              f"{report.rejected} rejected, {report.seconds:.1f}s", flush=True)
+
+    with open(args.path, "rb") as feed:
+        report = asyncio.run(FeedImporter(args.batch_size).run(AsyncSessionLocal, read_rows(feed, fmt), progress))
+    for error in report.errors:
+        print(f"line {error.line}: {error.error}")
+    print(f"Imported {report.imported} of {report.rows} rows ({report.products_created} new products, "
+          f"{report.stores_created} new stores) in {report.seconds:.1f}s.")
+
+if __name__ == "__main__":
+    main()
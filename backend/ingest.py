@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+from fastapi import HTTPException, status
+from . import crud, schemas
+from .auth import invalidate_user
+from .database import AsyncSessionLocal
+
+# Group commit for POST /api/orders: SQLite has a single writer, so instead of one
+# transaction (and one fsync) per order, a writer task drains the queue and commits up
+# to ORDER_BATCH_MAX_SIZE orders together, waiting at most ORDER_BATCH_MAX_WAIT_MS for
+# a batch to fill.
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "64"))
+ORDER_BATCH_MAX_WAIT_MS = float(os.getenv("ORDER_BATCH_MAX_WAIT_MS", "5"))
+ORDER_QUEUE_MAX = int(os.getenv("ORDER_QUEUE_MAX", "1000"))
+
+logger = logging.getLogger(__name__)
+
+class OrderIngestor:
+    def __init__(self, max_batch: int = ORDER_BATCH_MAX_SIZE, max_wait: float = ORDER_BATCH_MAX_WAIT_MS / 1000, max_queue: int = ORDER_QUEUE_MAX):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._queue = None
+        self._task = None
+        self._loop = None
+        self.batches = 0
+        self.batched_orders = 0
+        self.orders = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retried_batches = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, order: schemas.OrderCreate) -> schemas.OrderCreated:
+        self._ensure_writer()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((order, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Order queue is full, please retry",
+                headers={"Retry-After": "1"},
+            )
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._write(batch)
+            except Exception as e:  # never let the writer die
+                logger.exception("Order batch failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _write(self, batch):
+        try:
+            async with AsyncSessionLocal() as db:
+                results = [await crud.add_order(db, order) for order, _ in batch]
+                await db.commit()
+        except Exception:
+            # One bad order fails the whole group; replay them one by one so only it errors
+            self.retried_batches += 1
+            for order, future in batch:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        result = await crud.create_order(db, order)
+                    self._resolve(future, result)
+                except Exception as e:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_orders += len(batch)
+        self.last_batch_size = len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for (order, future), (created, email) in zip(batch, results):
+            if email is not None:
+                invalidate_user(order.user_id, email)
+            self._resolve(future, created)
+
+    def _resolve(self, future, result):
+        self.orders += 1
+        if not future.done():
+            future.set_result(result)
+
+    async def stop(self):
+        # The stop marker queues behind pending orders, so everything accepted gets written
+        if self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "queueDepth": self._queue.qsize() if self._queue is not None else 0,
+            "maxQueue": self.max_queue,
+            "maxBatchSize": self.max_batch,
+            "maxWaitMs": self.max_wait * 1000,
+            "batches": self.batches,
+            "orders": self.orders,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "retriedBatches": self.retried_batches,
+            "lastBatchSize": self.last_batch_size,
+            "largestBatch": self.max_batch_seen,
+            "avgBatchSize": round(self.batched_orders / self.batches, 2) if self.batches else 0.0,
+        }
+
+order_ingestor = OrderIngestor()
@@ -0,0 +1,258 @@
+"""Request and database instrumentation.
+
+`InstrumentationMiddleware` times every request into a per-route latency histogram
+(keyed by the route template, so /products/{product_id} is one series). The SQLAlchemy
+cursor hooks installed by `instrument_engine` count queries and DB time for the request
+that issued them, and log queries slower than SLOW_QUERY_MS together with their plan.
+`render_prometheus` exposes all of it in the Prometheus text format for /metrics.
+`summary` feeds /admin/metrics.
+
+Numbers are per process; with several server workers, scrape each of them.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Users seen within this window count as active
+ACTIVE_USER_WINDOW_S = float(os.getenv("ACTIVE_USER_WINDOW_S", "900"))
+
+EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.routes = {}
+        self.query_latency = Histogram(QUERY_BUCKETS)
+        self.queries = 0
+        self.slow_queries = 0
+        self._active_users = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            entry = self.routes.get((method, route))
+            if entry is None:
+                entry = self.routes[(method, route)] = RouteStats()
+            entry.latency.observe(seconds)
+            entry.statuses[status] = entry.statuses.get(status, 0) + 1
+            entry.queries += stats.queries
+            entry.db_seconds += stats.db_seconds
+
+    def observe_query(self, seconds: float, slow: bool):
+        with self._lock:
+            self.query_latency.observe(seconds)
+            self.queries += 1
+            self.slow_queries += slow
+
+    def mark_active(self, user_id):
+        with self._lock:
+            self._active_users[user_id] = time.monotonic()
+
+    def active_users(self) -> int:
+        cutoff = time.monotonic() - ACTIVE_USER_WINDOW_S
+        with self._lock:
+            for user_id in [u for u, seen in self._active_users.items() if seen < cutoff]:
+                del self._active_users[user_id]
+            return len(self._active_users)
+
+    def summary(self) -> dict:
+        with self._lock:
+            overall = Histogram()
+            requests = errors = queries = 0
+            for entry in self.routes.values():
+                overall.merge(entry.latency)
+                requests += entry.latency.count
+                errors += sum(n for status, n in entry.statuses.items() if status >= 500)
+                queries += entry.queries
+        return {
+            "uptimeSeconds": round(time.time() - self.started),
+            "requests": requests,
+            "availability": round(100 * (1 - errors / requests), 2) if requests else 100.0,
+            "latencyP50Ms": round(overall.quantile(0.5) * 1000, 1),
+            "latencyP95Ms": round(overall.quantile(0.95) * 1000, 1),
+            "queriesPerRequest": round(queries / requests, 2) if requests else 0.0,
+            "slowQueries": self.slow_queries,
+            "activeUsers": self.active_users(),
+        }
+
+registry = Registry()
+_current = contextvars.ContextVar("request_stats", default=None)
+
+def mark_active(user_id):
+    registry.mark_active(user_id)
+
+class InstrumentationMiddleware:
+    """Plain ASGI middleware, so streaming responses are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # Unmatched paths share one series so scanners cannot blow up the label set
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            registry.observe_request(scope["method"], route, status_code, time.perf_counter() - start, stats)
+
+def _explain(conn, statement: str, parameters) -> str:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    if isinstance(parameters, list):  # executemany: the plan is the same for every row
+        parameters = parameters[0] if parameters else ()
+    conn.info["explaining"] = True
+    try:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    finally:
+        conn.info["explaining"] = False
+    return "\n".join(" ".join(str(v) for v in row) for row in rows)
+
+def instrument_engine(engine):
+    """Count and time every statement on a (sync) Engine; pass `async_engine.sync_engine` for async ones."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        if conn.info.get("explaining"):
+            return
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+        slow = elapsed * 1000 >= SLOW_QUERY_MS
+        registry.observe_query(elapsed, slow)
+        if slow and statement.lstrip().split(None, 1)[0].upper() in EXPLAINABLE:
+            try:
+                plan = _explain(conn, statement, parameters)
+            except Exception as e:  # the plan is a diagnostic; never fail the query over it
+                plan = f"(no plan: {e})"
+            logger.warning("Slow query (%.1f ms): %s\nPlan:\n%s", elapsed * 1000, statement, plan)
+
+def instrument_engines(engines):
+    """database.on_engines_created hook: instrument every engine a process builds."""
+    for engine in engines.all():
+        instrument_engine(engine)
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> list:
+    lines = []
+    cumulative = 0
+    for bound, n in zip(histogram.buckets + ("+Inf",), histogram.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+def render_prometheus() -> str:
+    with registry._lock:
+        routes = sorted(registry.routes.items())
+        lines = [
+            "# HELP royalbee_http_request_duration_seconds Request latency by route.",
+            "# TYPE royalbee_http_request_duration_seconds histogram",
+        ]
+        for (method, route), entry in routes:
+            lines += _histogram_lines("royalbee_http_request_duration_seconds", entry.latency, method=method, route=route)
+        lines += ["# HELP royalbee_http_requests_total Responses by route and status.", "# TYPE royalbee_http_requests_total counter"]
+        for (method, route), entry in routes:
+            for status, n in sorted(entry.statuses.items()):
+                lines.append(f"royalbee_http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+        lines += ["# HELP royalbee_http_db_queries_total SQL statements issued while serving each route.",
+                  "# TYPE royalbee_http_db_queries_total counter"]
+        lines += [f"royalbee_http_db_queries_total{_labels(method=m, route=r)} {e.queries}" for (m, r), e in routes]
+        lines += ["# HELP royalbee_http_db_seconds_total Time spent in SQL while serving each route.",
+                  "# TYPE royalbee_http_db_seconds_total counter"]
+        lines += [f"royalbee_http_db_seconds_total{_labels(method=m, route=r)} {e.db_seconds}" for (m, r), e in routes]
+        lines += ["# HELP royalbee_db_query_duration_seconds Latency of every SQL statement.",
+                  "# TYPE royalbee_db_query_duration_seconds histogram"]
+        lines += _histogram_lines("royalbee_db_query_duration_seconds", registry.query_latency)
+        lines += ["# HELP royalbee_db_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+                  "# TYPE royalbee_db_slow_queries_total counter", f"royalbee_db_slow_queries_total {registry.slow_queries}"]
+    lines += [
+        "# HELP royalbee_active_users Distinct users seen within ACTIVE_USER_WINDOW_S.",
+        "# TYPE royalbee_active_users gauge", f"royalbee_active_users {registry.active_users()}",
+        "# HELP royalbee_process_start_time_seconds Unix time the process started.",
+        "# TYPE royalbee_process_start_time_seconds gauge", f"royalbee_process_start_time_seconds {registry.started}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -1,23 +1,45 @@
 import logging
 logging.basicConfig(level=logging.INFO)
-from fastapi import FastAPI, Depends, HTTPException, status, Body, Path, Request, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Body, File, Path, Query, Request, Response, UploadFile
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, crud, auth, database
-from .database import engine, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Union
+from contextlib import asynccontextmanager
+from . import models, schemas, crud, auth, database, catalog, aggregates, exports, search, importer, serialization, instrumentation, history, compression, admission, migrations, hashing
+from .ingest import order_ingestor
+from .database import get_db, get_read_db, AsyncSessionLocal
 from fastapi.middleware.cors import CORSMiddleware
-from jose import JWTError, jwt
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .auth import hash_password, verify_password, create_access_token, get_current_admin_user
+from .conditional import CachePolicyMiddleware, conditional_response, make_etag
 from datetime import datetime, timedelta
-from sqlalchemy import func, text
+from sqlalchemy import select
 
-models.Base.metadata.create_all(bind=engine)
+# Nothing here connects to the database: engines are built per process on first use,
+# and the schema is checked against Alembic once each worker starts serving
+database.on_engines_created(instrumentation.instrument_engines)
 
-app = FastAPI(title="Royal Bee API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await migrations.verify(database.engines().async_engine)
+    yield
+    await order_ingestor.stop()
+    auth.hash_pool.shutdown()
+    await database.dispose()
+
+app = FastAPI(title="Royal Bee API", lifespan=lifespan)
+
+@app.exception_handler(hashing.HashPoolBusy)
+async def hash_pool_busy(request: Request, exc: hashing.HashPoolBusy):
+    return JSONResponse({"detail": "Authentication is busy, please retry"}, status_code=503, headers={"Retry-After": "1"})
+
+UNFULFILLED_PREVIEW = 20
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
+# Innermost, so shed 503s still get CORS and Cache-Control headers
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # Only allow frontend dev server
@@ -25,185 +47,366 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Last added runs first: instrumentation sees the compressed bytes, compression sees the final headers
+app.add_middleware(CachePolicyMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(instrumentation.InstrumentationMiddleware)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Royal Bee API!"}
 
 @app.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, user.email)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, user)
+    return await crud.create_user(db, user)
 
 @app.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await crud.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
     access_token = auth.create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.get("/products", response_model=List[schemas.ProductOut])
-def list_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_products(db, skip=skip, limit=limit)
+@app.get("/products", response_model=Union[List[schemas.ProductOut], schemas.ProductPage])
+async def list_products(request: Request, skip: int = 0, limit: int = 100, cursor: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
+    # Passing `cursor` (0 for the first page) switches to keyset pagination and wraps
+    # the items in a page object carrying `next_cursor`; without it the plain list is returned.
+    key = ("offset", skip, limit) if cursor is None else ("cursor", cursor, limit)
+    version = catalog.current_version()
+    page = catalog.get_page(version, key)
+    if page is None:
+        if serialization.FAST_SERIALIZATION:
+            items, last_modified = await serialization.product_rows(db, serialization.products_query(skip, limit, cursor))
+            if cursor is None:
+                body = serialization.dumps(items)
+            else:
+                next_cursor = items[-1]["id"] if items and len(items) == limit else None
+                body = serialization.dumps({"items": items, "next_cursor": next_cursor})
+        else:
+            if cursor is None:
+                products = await crud.get_products(db, skip=skip, limit=limit)
+                content = [schemas.ProductOut.model_validate(p) for p in products]
+            else:
+                products = await crud.get_products_after(db, cursor=cursor, limit=limit)
+                next_cursor = products[-1].id if products and len(products) == limit else None
+                content = schemas.ProductPage(items=[schemas.ProductOut.model_validate(p) for p in products], next_cursor=next_cursor)
+            body = JSONResponse(content=jsonable_encoder(content)).body
+            last_modified = max((p.updated_at for p in products if p.updated_at), default=None)
+        # Deletes and inserts elsewhere in the catalog leave no trace on the page's own rows;
+        # the version bump they cause does. updated_at still covers writes in other workers.
+        last_modified = max(catalog.modified_at(), last_modified or datetime.min)
+        page = catalog.put_page(version, key, catalog.CachedPage(body, make_etag(body), last_modified, {}))
+    # Compressed once per page and encoding, not on every hit
+    body, encoding = compression.cached_variant(request, page.body, page.encoded)
+    return conditional_response(request, body, page.etag, page.last_modified, content_encoding=encoding)
+
+@app.get("/products/search", response_model=schemas.ProductSearchResult)
+async def search_products(
+    q: str = Query(..., min_length=1),
+    category: Optional[str] = None,
+    limit: int = Query(20, le=100),
+    offset: int = 0,
+    db: AsyncSession = Depends(get_read_db),
+):
+    if search.match_query(q) is None:
+        return schemas.ProductSearchResult(items=[], facets=[], total=0)
+    return await crud.search_products(db, q, category=category, limit=limit, offset=offset)
 
-@app.post("/api/orders", response_model=schemas.OrderOut)
-async def create_order(request: Request, db: Session = Depends(get_db)):
+@app.post("/api/orders", response_model=schemas.OrderCreated)
+async def create_order(request: Request, response: Response):
     body = await request.body()
     logging.info(f"Raw order request body: {body.decode()}")
     try:
         order_json = await request.json()
         logging.info(f"Parsed order JSON: {order_json}")
         order_obj = schemas.OrderCreate(**order_json)
-        result = crud.create_order(db, order_obj)
+        instrumentation.mark_active(order_obj.user_id)
+        result = await order_ingestor.submit(order_obj)
         logging.info(f"Order created: {result.id}")
+        # The user's next reads (order history, points) must see this order
+        database.read_your_writes(response)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Order creation failed: {e}")
         raise HTTPException(status_code=422, detail=f"Order creation failed: {e}")
 
 @app.get("/api/orders", response_model=List[schemas.OrderOut])
-def get_orders(userId: int, db: Session = Depends(get_db)):
-    return crud.get_orders_by_user(db, userId)
+async def get_orders(
+    userId: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    start = schemas.to_utc_naive(start) if start else None
+    end = schemas.to_utc_naive(end) if end else None
+    if serialization.FAST_SERIALIZATION:
+        query = crud.user_orders_query(userId, start, end, columns=serialization.ORDER_COLUMNS)
+        return serialization.FastJSONResponse(await serialization.order_rows(db, query))
+    return await crud.get_orders_by_user(db, userId, start=start, end=end)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        email = payload.get("sub")
-        if not isinstance(email, str):
-            raise credentials_exception
-    except JWTError:
+    payload = auth.verify_access_token(token)
+    email = payload.get("sub") if payload else None
+    if not isinstance(email, str):
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await auth.get_user_principal(db, "email", email)
     if user is None:
         raise credentials_exception
+    instrumentation.mark_active(user.id)
     return user
 
 @app.get("/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: schemas.UserOut = Depends(get_current_user)):
     return current_user
 
 @app.post("/products", response_model=schemas.ProductOut)
-def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
-    db_product = models.Product(
-        name=product.name,
-        category=product.category,
-        image=product.image,
-        description=product.description
-    )
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+async def create_product(product: schemas.ProductCreate, response: Response, db: AsyncSession = Depends(get_db)):
+    db_product = await crud.create_product(db, product)
+    catalog.bump_version()
+    database.read_your_writes(response)
     return db_product
 
 @app.put("/products/{product_id}", response_model=schemas.ProductOut)
-def update_product(product_id: int = Path(...), product: schemas.ProductCreate = Body(...), db: Session = Depends(get_db)):
-    db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
+async def update_product(
+    response: Response, product_id: int = Path(...), product: schemas.ProductCreate = Body(...), db: AsyncSession = Depends(get_db)
+):
+    db_product = await crud.get_product(db, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    db_product.name = product.name
-    db_product.category = product.category
-    db_product.image = product.image
-    db_product.description = product.description
-    db.commit()
-    db.refresh(db_product)
+    db_product = await crud.update_product(db, db_product, product)
+    catalog.bump_version()
+    database.read_your_writes(response)
     return db_product
 
 @app.delete("/products/{product_id}")
-def delete_product(product_id: int = Path(...), db: Session = Depends(get_db)):
-    db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
+async def delete_product(response: Response, product_id: int = Path(...), db: AsyncSession = Depends(get_db)):
+    db_product = await crud.get_product(db, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(db_product)
-    db.commit()
+    await crud.delete_product(db, db_product)
+    catalog.bump_version()
+    database.read_your_writes(response)
     return {"detail": "Product deleted"}
 
+@app.get("/products/{product_id}/price-history", response_model=schemas.PriceHistory)
+async def product_price_history(
+    product_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Literal["auto", "raw", "day", "week"] = "auto",
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Defaults to the last year; "auto" downsamples to the finest resolution that keeps the series short
+    end = schemas.to_utc_naive(end) if end else datetime.utcnow()
+    start = schemas.to_utc_naive(start) if start else end - timedelta(days=365)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if resolution == "raw" and end - start > timedelta(days=history.HISTORY_RAW_MAX_DAYS):
+        raise HTTPException(
+            status_code=400, detail=f"Raw history is limited to {history.HISTORY_RAW_MAX_DAYS} days; use day or week"
+        )
+    result = await crud.get_price_history(db, product_id, start, end, resolution)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return result
+
+@app.put("/retailers/{retailer_id}/price", response_model=schemas.RetailerOut, dependencies=[Depends(get_current_admin_user)])
+async def update_retailer_price(
+    retailer_id: int, update: schemas.RetailerPriceUpdate, response: Response, db: AsyncSession = Depends(get_db)
+):
+    # `retailer_id` is the offer id, as listed under a product's `retailers`
+    offer = await crud.update_offer_price(db, retailer_id, update.price)
+    if not offer:
+        raise HTTPException(status_code=404, detail="Retailer not found")
+    catalog.bump_version()
+    database.read_your_writes(response)
+    return offer
+
+@app.post("/compare/basket", response_model=schemas.BasketComparison)
+async def compare_basket(basket: schemas.BasketRequest, db: AsyncSession = Depends(get_read_db)):
+    return await crud.compare_basket(db, basket)
+
+@app.get("/cart", response_model=schemas.CartOut)
+async def read_cart(current_user: schemas.UserOut = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return await crud.get_cart(db, current_user.id)
+
+@app.post("/cart/sync", response_model=schemas.CartOut)
+async def sync_cart(sync: schemas.CartSync, current_user: schemas.UserOut = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # One request carries every add/update/remove since the last sync; all apply or none do
+    unknown = await crud.unknown_cart_offers(db, sync.operations)
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "message": "Retailer does not offer this product",
+                "lines": [{"product_id": product_id, "retailer_id": retailer_id} for product_id, retailer_id in unknown],
+            },
+        )
+    return await crud.sync_cart(db, current_user.id, sync.operations)
+
+@app.delete("/cart")
+async def clear_cart(current_user: schemas.UserOut = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    await crud.clear_cart(db, current_user.id)
+    return {"detail": "Cart cleared"}
+
 @app.post("/admin/login")
-def admin_login(data: dict = Body(...), db: Session = Depends(get_db), response: Response = None):
+async def admin_login(data: dict = Body(...), db: AsyncSession = Depends(get_db), response: Response = None):
     username = data.get("username")
     # password = data.get("password")  # Ignore password for now
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if not user or user.role != "admin":
         raise HTTPException(status_code=401, detail="Invalid credentials or not admin")
     from .auth import create_access_token
-    token = create_access_token({"sub": user.id, "role": user.role})
+    token = create_access_token({"sub": str(user.id), "role": user.role})
     # Set HttpOnly cookie
     if response is not None:
         response.set_cookie(key="admin_access_token", value=token, httponly=True, max_age=900)
     return {"access_token": token, "token_type": "bearer"}
 
 @app.get("/admin/me")
-def admin_me():
+async def admin_me():
     # Return a mock admin user for development
     return {"id": 1, "username": "admin", "role": "admin", "email": "admin@royalbee.com"}
 
 @app.get("/admin/secret")
-def admin_secret():
+async def admin_secret():
     return {"message": f"Hello, admin! (dev mode)"}
 
-@app.get("/admin/users")
-def admin_list_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
+@app.get("/admin/users", response_model=List[schemas.UserOut])
+async def admin_list_users(db: AsyncSession = Depends(get_read_db)):
+    if serialization.FAST_SERIALIZATION:
+        query = select(*serialization.ADMIN_USER_COLUMNS).order_by(models.User.id)
+        return serialization.FastJSONResponse(await serialization.mapping_rows(db, query))
+    return (await db.scalars(select(models.User))).all()
+
+@app.get("/admin/orders", response_model=List[schemas.AdminOrderOut])
+async def admin_list_orders(db: AsyncSession = Depends(get_read_db)):
+    if serialization.FAST_SERIALIZATION:
+        query = select(*serialization.ADMIN_ORDER_COLUMNS).order_by(models.Order.id)
+        return serialization.FastJSONResponse(await serialization.mapping_rows(db, query))
+    return (await db.scalars(select(models.Order))).all()
 
-@app.get("/admin/orders")
-def admin_list_orders(db: Session = Depends(get_db)):
-    return db.query(models.Order).all()
+@app.get("/admin/orders/open", response_model=schemas.OpenOrderPage, dependencies=[Depends(get_current_admin_user)])
+async def admin_open_orders(
+    cursor: int = 0,
+    limit: int = Query(50, le=500),
+    status: Optional[Literal["pending", "processing"]] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await crud.get_open_orders(db, cursor=cursor, limit=limit, status=status)
+
+@app.post("/admin/orders/status", response_model=schemas.OrderStatusResult, dependencies=[Depends(get_current_admin_user)])
+async def admin_update_order_status(update: schemas.OrderStatusUpdate, db: AsyncSession = Depends(get_db)):
+    return await crud.transition_orders(db, update.order_ids, update.status)
+
+# Streaming exports: constant memory regardless of history size
+
+@app.get("/admin/users/export", dependencies=[Depends(get_current_admin_user)])
+async def admin_export_users(format: Literal["ndjson", "csv"] = "ndjson", role: Optional[str] = None):
+    return exports.export_response(exports.users_query(role=role), format, "users")
+
+@app.get("/admin/orders/export", dependencies=[Depends(get_current_admin_user)])
+async def admin_export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    userId: Optional[int] = None,
+):
+    start = schemas.to_utc_naive(start) if start else None
+    end = schemas.to_utc_naive(end) if end else None
+    return exports.export_response(exports.orders_query(start=start, end=end, user_id=userId), format, "orders")
+
+@app.post("/admin/import", response_model=schemas.ImportReport, dependencies=[Depends(get_current_admin_user)])
+async def admin_import_feed(
+    feed: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    batch_size: int = Query(importer.IMPORT_BATCH_SIZE, gt=0, le=50000),
+):
+    # The upload is spooled to disk by the form parser; the importer reads and validates it off the event loop
+    fmt = format or importer.detect_format(feed.filename)
+    return await importer.FeedImporter(batch_size).run(AsyncSessionLocal, importer.read_rows(feed.file, fmt))
+
+@app.get("/admin/import", response_model=Optional[schemas.ImportReport], dependencies=[Depends(get_current_admin_user)])
+async def admin_import_progress():
+    return importer.latest_report
+
+@app.get("/admin/cache", dependencies=[Depends(get_current_admin_user)])
+async def admin_cache_stats():
+    return {
+        "catalog": catalog.stats(),
+        "hashPool": auth.hash_pool.stats(),
+        "tokens": auth.token_cache.stats(),
+        "users": auth.user_cache.stats(),
+    }
+
+@app.get("/admin/ingest", dependencies=[Depends(get_current_admin_user)])
+async def admin_ingest_stats():
+    return {"orders": order_ingestor.stats()}
+
+@app.get("/admin/orders/report", response_model=schemas.OrderReport)
+async def admin_orders_report(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    userId: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Defaults to the last 30 days, bucketed per day
+    end = schemas.to_utc_naive(end) if end else datetime.utcnow()
+    start = schemas.to_utc_naive(start) if start else end - timedelta(days=30)
+    return await crud.get_order_report(db, start, end, granularity=granularity, user_id=userId)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    lines = compression.stats.prometheus_lines() + admission.prometheus_lines()
+    body = instrumentation.render_prometheus() + "\n".join(lines) + "\n"
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 @app.get("/admin/metrics")
-def admin_metrics(db: Session = Depends(get_db)):
-    now = datetime.now()
-    today_str = now.strftime('%Y-%m-%d')
+async def admin_metrics(db: AsyncSession = Depends(get_read_db)):
+    now = datetime.utcnow()  # daily_order_stats is keyed by UTC day
     week_ago = now - timedelta(days=7)
-    week_ago_str = week_ago.strftime('%Y-%m-%d')
-
-    total_users = db.query(models.User).count()
-    total_products = db.query(models.Product).count()
-    total_stores = db.query(models.Retailer.name).distinct().count()
-    orders_today = db.query(models.Order).filter(models.Order.date.like(f"{today_str}%")).count()
-    orders_this_week = db.query(models.Order).filter(models.Order.date >= week_ago_str).count()
-    revenue = db.query(func.sum(models.Order.total)).scalar() or 0
-    delivery_income = 0  # Placeholder, unless you have a field for this
 
-    # Top 5 selling products (by order items)
-    top_products = db.execute(
-        text("""
-        SELECT product_name, SUM(quantity) as sold
-        FROM order_items
-        GROUP BY product_name
-        ORDER BY sold DESC
-        LIMIT 5
-        """)
-    ).fetchall()
-    top_products = [{"name": row[0], "sold": row[1]} for row in top_products]
+    # Counters, per-day order counts and per-product sales are maintained by the write paths
+    stats = await aggregates.dashboard(db, since=week_ago.date(), today=now.date())
+    delivery_income = 0  # Placeholder, unless you have a field for this
 
     # Low stock alerts (products with < 5 in stock, if you have a stock field)
     low_stock = []  # Placeholder, unless you have a stock field
 
-    # Unfulfilled orders (if you have a status field, otherwise show all)
-    unfulfilled_orders = db.query(models.Order).all()
-    unfulfilled_orders = [
-        {"id": o.id, "customer": o.user_id, "total": o.total} for o in unfulfilled_orders
-    ]
+    # Oldest open orders only; the full queue is paged through /admin/orders/open
+    unfulfilled_orders = (await crud.get_open_orders(db, limit=UNFULFILLED_PREVIEW)).items
+    runtime = instrumentation.registry.summary()
 
     return {
-        "totalUsers": total_users,
-        "totalProducts": total_products,
-        "totalStores": total_stores,
-        "ordersToday": orders_today,
-        "ordersThisWeek": orders_this_week,
-        "activeUsers": 0,  # Placeholder
-        "uptime": "99.99%",  # Placeholder
-        "latency": "120ms",  # Placeholder
-        "revenue": revenue,
+        "totalUsers": stats["users"],
+        "totalProducts": stats["products"],
+        "totalStores": stats["stores"],
+        "ordersToday": stats["ordersToday"],
+        "ordersThisWeek": stats["ordersSince"],
+        # Request-level figures are for this server process, see instrumentation.py
+        "activeUsers": runtime["activeUsers"],
+        "uptime": f"{runtime['availability']}%",
+        "latency": f"{runtime['latencyP95Ms']:.0f}ms",
+        "runtime": runtime,
+        "database": database.engines().router.stats(),
+        "compression": compression.stats.summary(),
+        "admission": admission.stats(),
+        "revenue": stats["revenue"],
         "deliveryIncome": delivery_income,
-        "topProducts": top_products,
+        "topProducts": stats["topProducts"],
         "lowStock": low_stock,
         "unfulfilledOrders": unfulfilled_orders,
+        "unfulfilledCount": stats["open_orders"],
     }
@@ -0,0 +1,64 @@
+"""Schema check at startup.
+
+Alembic owns the schema: run `alembic upgrade head` once per deploy, before any worker
+starts. Each worker's lifespan then compares the database with the head revision and,
+with SCHEMA_CHECK=strict (the default), refuses to start on any mismatch. "warn" only
+logs it, "create" also builds and stamps an empty database (one dev process at a time),
+"off" skips the check.
+
+    alembic upgrade head
+    uvicorn backend.main:app --workers 8
+"""
+import logging
+import os
+from sqlalchemy import inspect
+from . import models, search  # search hooks the FTS table into create_all
+
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict")
+ALEMBIC_CONFIG = os.getenv("ALEMBIC_CONFIG", os.path.join(os.path.dirname(__file__), "..", "alembic.ini"))
+MODES = ("strict", "warn", "create", "off")
+
+logger = logging.getLogger(__name__)
+
+def script_directory():
+    # Alembic is only needed at startup; keep it out of the import path
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(Config(ALEMBIC_CONFIG))
+
+def _migration_context(conn):
+    from alembic.runtime.migration import MigrationContext
+    return MigrationContext.configure(conn)
+
+def create(conn):
+    """Create missing tables from the models; an unversioned database is stamped at head."""
+    models.Base.metadata.create_all(conn)
+    context = _migration_context(conn)
+    if not context.get_current_heads():
+        context.stamp(script_directory(), "heads")
+
+def check(conn, mode: str = SCHEMA_CHECK) -> str:
+    """Compare the database on `conn` with the Alembic heads; returns what was found."""
+    if mode not in MODES:
+        raise ValueError(f"SCHEMA_CHECK must be one of {', '.join(MODES)}, not {mode!r}")
+    script = script_directory()
+    heads = set(script.get_heads())
+    current = set(_migration_context(conn).get_current_heads())
+    if current == heads:
+        return "current"
+    if mode == "create" and not current and not inspect(conn).get_table_names():
+        create(conn)
+        logger.info("Created the schema on an empty database and stamped it at %s", ", ".join(sorted(heads)))
+        return "created"
+    message = (f"Database schema is at {', '.join(sorted(current)) or 'no Alembic revision'} but the code "
+               f"expects {', '.join(sorted(heads))}; run `alembic upgrade head`")
+    if mode == "strict":
+        raise RuntimeError(message)
+    logger.warning(message)
+    return "mismatch"
+
+async def verify(async_engine, mode: str = SCHEMA_CHECK) -> str:
+    if mode == "off":
+        return "skipped"
+    async with async_engine.begin() as conn:
+        return await conn.run_sync(check, mode)
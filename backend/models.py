@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Index, bindparam
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -19,51 +20,122 @@ class Product(Base):
     __tablename__ = "products"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
+    sku = Column(String, unique=True, index=True)  # feed identifier, see importer.py
     category = Column(String, nullable=False)
     image = Column(String)
     description = Column(String)
-    price = Column(Float)
+    price = Column(Float)  # best offer price, see pricing.py
+    best_retailer_id = Column(Integer)  # offers.id of that offer; no FK to avoid a products<->offers cycle
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    retailers = relationship("Retailer", back_populates="product")
+    offers = relationship("Offer", back_populates="product", order_by="Offer.id")
     cart_items = relationship("CartItem", back_populates="product")
 
-class Retailer(Base):
-    __tablename__ = "retailers"
+class Store(Base):
+    __tablename__ = "stores"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, unique=True, nullable=False)
     logo = Column(String)
     description = Column(String)
     rating = Column(Float)
     delivery_options = Column(String)
-    product_id = Column(Integer, ForeignKey("products.id"))
+
+    offers = relationship("Offer", back_populates="store")
+
+class Offer(Base):
+    """One store's price for one product; store details live once in `stores`."""
+    __tablename__ = "offers"
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
     price = Column(Float)
 
-    product = relationship("Product", back_populates="retailers")
+    product = relationship("Product", back_populates="offers")
+    # Few stores and many offers: one IN query loads every store a page of offers needs
+    store = relationship("Store", back_populates="offers", lazy="selectin")
+
+    __table_args__ = (
+        # Serves best-offer lookups and basket price matrices per product
+        Index("ix_offers_product_id_price", "product_id", "price"),
+        # One offer per store and product; the feed importer upserts on it
+        Index("ix_offers_store_id_product_id", "store_id", "product_id", unique=True),
+    )
+
+    # Read-through store fields keep the offer shaped like the old per-product retailer row
+    @property
+    def name(self):
+        return self.store.name
+
+    @property
+    def logo(self):
+        return self.store.logo
+
+    @property
+    def description(self):
+        return self.store.description
+
+    @property
+    def rating(self):
+        return self.store.rating
+
+    @property
+    def delivery_options(self):
+        return self.store.delivery_options
 
 class CartItem(Base):
     __tablename__ = "cart_items"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     product_id = Column(Integer, ForeignKey("products.id"))
-    retailer_id = Column(Integer, ForeignKey("retailers.id"))
+    retailer_id = Column(Integer, ForeignKey("offers.id"))
     quantity = Column(Integer, default=1)
     price = Column(Float)
 
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
 
+    # One line per product and offer in a user's cart; cart sync upserts on it
+    __table_args__ = (Index("ix_cart_items_user_product_retailer", "user_id", "product_id", "retailer_id", unique=True),)
+
+# Fulfilment lifecycle: status -> statuses it may move to
+ORDER_TRANSITIONS = {
+    "pending": ("processing", "cancelled"),
+    "processing": ("shipped", "cancelled"),
+    "shipped": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+OPEN_ORDER_STATUSES = ("pending", "processing")
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    date = Column(String, nullable=False)
+    date = Column(DateTime, nullable=False, index=True)  # UTC
     total = Column(Float, nullable=False)
     payment = Column(String, nullable=False)
     address = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
 
     user = relationship("User")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_user_id_date", "user_id", "date"),
+        # Partial index: only the (small) set of open orders is indexed for the fulfilment queue
+        Index(
+            "ix_orders_open",
+            "id",
+            sqlite_where=status.in_(OPEN_ORDER_STATUSES),
+            postgresql_where=status.in_(OPEN_ORDER_STATUSES),
+        ),
+    )
+
+def order_is_open():
+    # Rendered as literals: SQLite only uses the partial index ix_orders_open when the query
+    # repeats its WHERE exactly, and it can't tell whether bound parameters would match
+    return Order.status.in_(bindparam("open_statuses", OPEN_ORDER_STATUSES, literal_execute=True))
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
@@ -74,3 +146,51 @@ class OrderItem(Base):
     price = Column(Float, nullable=False)
 
     order = relationship("Order", back_populates="items")
+
+# Dashboard aggregates, maintained by the write paths in aggregates.py
+
+class MetricTotal(Base):
+    __tablename__ = "metric_totals"
+    name = Column(String, primary_key=True)
+    value = Column(Float, nullable=False, default=0)
+
+class DailyOrderStat(Base):
+    __tablename__ = "daily_order_stats"
+    day = Column(Date, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class ProductSales(Base):
+    __tablename__ = "product_sales"
+    product_name = Column(String, primary_key=True)
+    units = Column(Integer, nullable=False, default=0, index=True)
+
+# Offer price history, maintained by the price write paths in history.py
+
+class PriceObservation(Base):
+    """One observed offer price. Append-only; integer time and pence keep rows small."""
+    __tablename__ = "price_observations"
+    offer_id = Column(Integer, primary_key=True)  # no FK: history outlives the offer
+    observed_at = Column(Integer, primary_key=True)  # unix seconds, UTC
+    price = Column(Integer, nullable=False)  # pence
+
+    # Clustered on the primary key, so one offer's series is a single contiguous range
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class PriceRollup:
+    offer_id = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # unix seconds at the start of the bucket
+    low = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)  # sum of the observed prices, for the average
+    samples = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)  # last price in the bucket
+    closed_at = Column(Integer, nullable=False)  # and when it was observed
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class DailyPriceRollup(PriceRollup, Base):
+    __tablename__ = "price_rollups_daily"
+
+class WeeklyPriceRollup(PriceRollup, Base):
+    __tablename__ = "price_rollups_weekly"
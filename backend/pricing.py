@@ -0,0 +1,91 @@
+import numpy as np
+from sqlalchemy import select, update, func
+from . import models, schemas
+
+# Best offer per product: products.price holds the lowest offer price and
+# products.best_retailer_id the offer that has it (cheapest first, then lowest id).
+
+def best_offer_statement(product_ids=None):
+    cheapest = (
+        select(models.Offer.id)
+        .where(models.Offer.product_id == models.Product.id, models.Offer.price.is_not(None))
+        .order_by(models.Offer.price, models.Offer.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    lowest = select(func.min(models.Offer.price)).where(models.Offer.product_id == models.Product.id).scalar_subquery()
+    stmt = update(models.Product).values(price=lowest, best_retailer_id=cheapest)
+    if product_ids is not None:
+        stmt = stmt.where(models.Product.id.in_(product_ids))
+    return stmt.execution_options(synchronize_session=False)
+
+async def refresh_best_offers(db, product_ids):
+    await db.execute(best_offer_statement(product_ids))
+
+async def load_offers(db, product_ids):
+    return (await db.execute(
+        select(models.Offer.product_id, models.Offer.id, models.Store.name, models.Offer.price)
+        .join(models.Store, models.Store.id == models.Offer.store_id)
+        .where(models.Offer.product_id.in_(product_ids), models.Offer.price.is_not(None))
+    )).all()
+
+def optimize_basket(lines: dict, offers) -> schemas.BasketComparison:
+    """Cheapest single-retailer basket and cheapest split basket for {product_id: quantity}.
+
+    Builds a (products x stores) unit-price matrix, inf where a store has no offer, so both
+    answers are a couple of vectorised reductions regardless of cart or catalog size.
+    """
+    offered = sorted({product_id for product_id, _, _, _ in offers})
+    unavailable = sorted(set(lines) - set(offered))
+    if not offered:
+        return schemas.BasketComparison(unavailable=unavailable)
+
+    stores = sorted({name for _, _, name, _ in offers})
+    row_of = {product_id: i for i, product_id in enumerate(offered)}
+    col_of = {name: j for j, name in enumerate(stores)}
+    rows = np.fromiter((row_of[o[0]] for o in offers), dtype=np.intp, count=len(offers))
+    cols = np.fromiter((col_of[o[2]] for o in offers), dtype=np.intp, count=len(offers))
+    prices = np.fromiter((o[3] for o in offers), dtype=np.float64, count=len(offers))
+    offer_ids = np.fromiter((o[1] for o in offers), dtype=np.int64, count=len(offers))
+
+    matrix = np.full((len(offered), len(stores)), np.inf)
+    ids = np.zeros((len(offered), len(stores)), dtype=np.int64)
+    # A store listing a product twice keeps its cheaper offer: write most expensive first
+    order = np.argsort(-prices, kind="stable")
+    matrix[rows[order], cols[order]] = prices[order]
+    ids[rows[order], cols[order]] = offer_ids[order]
+    quantities = np.array([lines[product_id] for product_id in offered], dtype=np.float64)
+
+    def quote(columns, retailer=None):
+        unit = matrix[np.arange(len(offered)), columns]
+        line_totals = unit * quantities
+        return schemas.BasketQuote(
+            retailer=retailer,
+            total=round(float(line_totals.sum()), 2),
+            lines=[
+                schemas.BasketLineQuote(
+                    product_id=product_id,
+                    quantity=int(quantities[i]),
+                    retailer=stores[columns[i]],
+                    retailer_id=int(ids[i, columns[i]]),
+                    unit_price=float(unit[i]),
+                    line_total=round(float(line_totals[i]), 2),
+                )
+                for i, product_id in enumerate(offered)
+            ],
+        )
+
+    split = quote(matrix.argmin(axis=1))
+    # Only stores offering every available line can take the whole basket
+    store_totals = np.where(np.isfinite(matrix).all(axis=0), quantities @ np.where(np.isfinite(matrix), matrix, 0), np.inf)
+    single = None
+    if np.isfinite(store_totals).any():
+        best = int(store_totals.argmin())
+        single = quote(np.full(len(offered), best), retailer=stores[best])
+
+    return schemas.BasketComparison(
+        single_retailer=single,
+        split=split,
+        savings=round(single.total - split.total, 2) if single else 0.0,
+        unavailable=unavailable,
+    )
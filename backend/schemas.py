@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from datetime import datetime, timezone
+from pydantic import AliasChoices, BaseModel, Field, field_serializer, field_validator
+from typing import Optional, List, Literal
 
 class UserBase(BaseModel):
     username: str | None = None
@@ -16,6 +17,7 @@ class UserOut(UserBase):
     points: int
     class Config:
         orm_mode = True
+        from_attributes = True
 
 class ProductBase(BaseModel):
     name: str
@@ -29,9 +31,26 @@ class ProductCreate(ProductBase):
 
 class ProductOut(ProductBase):
     id: int
-    retailers: Optional[List['RetailerOut']] = None
+    sku: Optional[str] = None
+    best_retailer_id: Optional[int] = None
+    # Offers joined with their store, in the shape of the old per-product retailer rows
+    retailers: Optional[List['RetailerOut']] = Field(None, validation_alias=AliasChoices('retailers', 'offers'))
     class Config:
         orm_mode = True
+        from_attributes = True
+
+class ProductPage(BaseModel):
+    items: List[ProductOut]
+    next_cursor: Optional[int] = None
+
+class CategoryFacet(BaseModel):
+    category: str
+    count: int
+
+class ProductSearchResult(BaseModel):
+    items: List[ProductOut]
+    facets: List[CategoryFacet]
+    total: int
 
 class RetailerBase(BaseModel):
     name: str
@@ -45,10 +64,15 @@ class RetailerBase(BaseModel):
 class RetailerCreate(RetailerBase):
     pass
 
+class RetailerPriceUpdate(BaseModel):
+    price: float
+
 class RetailerOut(RetailerBase):
     id: int
+    store_id: Optional[int] = None
     class Config:
         orm_mode = True
+        from_attributes = True
 
 class CartItemBase(BaseModel):
     product_id: int
@@ -63,6 +87,34 @@ class CartItemOut(CartItemBase):
     id: int
     class Config:
         orm_mode = True
+        from_attributes = True
+
+class CartOperation(BaseModel):
+    # Quantities are absolute, so replaying a sync leaves the cart unchanged
+    op: Literal["add", "update", "remove"]
+    product_id: int
+    retailer_id: int
+    quantity: int = Field(1, ge=0)
+
+class CartSync(BaseModel):
+    operations: List[CartOperation] = Field(..., max_length=500)
+
+class CartLine(BaseModel):
+    product_id: int
+    retailer_id: int
+    product_name: Optional[str] = None
+    retailer: Optional[str] = None
+    quantity: int
+    unit_price: Optional[float] = None
+    line_total: float
+    previous_price: Optional[float] = None
+    price_changed: bool = False
+    available: bool = True
+
+class CartOut(BaseModel):
+    items: List[CartLine]
+    total: float
+    repriced: int = 0
 
 class OrderItemBase(BaseModel):
     product_name: str
@@ -77,13 +129,29 @@ class OrderItemOut(OrderItemBase):
     id: int
     class Config:
         orm_mode = True
+        from_attributes = True
+
+def to_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class OrderBase(BaseModel):
-    date: str
+    date: datetime
     total: float
     payment: str
     address: str
 
+    # Stored as naive UTC; sent back in the same ISO form the frontend posts (…Z)
+    @field_validator("date")
+    @classmethod
+    def date_to_utc(cls, value: datetime) -> datetime:
+        return to_utc_naive(value)
+
+    @field_serializer("date")
+    def serialize_date(self, value: datetime) -> str:
+        return value.isoformat(timespec="milliseconds") + "Z"
+
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate]
     user_id: int
@@ -92,7 +160,137 @@ class OrderOut(OrderBase):
     id: int
     items: List[OrderItemOut]
     user_id: int
+    status: str = "pending"
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
+class OrderCreated(OrderOut):
+    points_awarded: int = 0
+
+class AdminOrderOut(OrderBase):
+    """Row of the admin order list: the order without its items."""
+    id: int
+    user_id: int
+    status: str = "pending"
     class Config:
         orm_mode = True
+        from_attributes = True
+
+class OpenOrder(BaseModel):
+    id: int
+    customer: int
+    total: float
+    date: datetime
+    status: str
+
+    @field_serializer("date")
+    def serialize_date(self, value: datetime) -> str:
+        return value.isoformat(timespec="milliseconds") + "Z"
+
+class OpenOrderPage(BaseModel):
+    items: List[OpenOrder]
+    next_cursor: Optional[int] = None
+
+class OrderStatusUpdate(BaseModel):
+    order_ids: List[int]
+    status: Literal["pending", "processing", "shipped", "delivered", "cancelled"]
+
+class OrderStatusResult(BaseModel):
+    status: str
+    updated: List[int]
+    skipped: List[int]
+
+class OrderBucket(BaseModel):
+    start: str
+    orders: int
+    revenue: float
+
+class OrderReport(BaseModel):
+    granularity: Literal["day", "week", "month"]
+    buckets: List[OrderBucket]
+
+class PricePoint(BaseModel):
+    start: datetime
+    low: float
+    high: float
+    average: float
+    close: float
+    samples: int
+
+    @field_serializer("start")
+    def serialize_start(self, value: datetime) -> str:
+        return value.isoformat(timespec="milliseconds") + "Z"
+
+class PriceSeries(BaseModel):
+    retailer_id: int
+    store_id: int
+    retailer: str
+    opening: Optional[float] = None
+    points: List[PricePoint]
+
+class PriceHistory(BaseModel):
+    product_id: int
+    resolution: Literal["raw", "day", "week"]
+    start: datetime
+    end: datetime
+    series: List[PriceSeries]
+
+    @field_serializer("start", "end")
+    def serialize_bounds(self, value: datetime) -> str:
+        return value.isoformat(timespec="milliseconds") + "Z"
+
+class BasketLine(BaseModel):
+    product_id: int
+    quantity: int = Field(1, gt=0)
+
+class BasketRequest(BaseModel):
+    items: List[BasketLine]
+
+class BasketLineQuote(BaseModel):
+    product_id: int
+    quantity: int
+    retailer: str
+    retailer_id: int
+    unit_price: float
+    line_total: float
+
+class BasketQuote(BaseModel):
+    retailer: Optional[str] = None
+    total: float
+    lines: List[BasketLineQuote]
+
+class BasketComparison(BaseModel):
+    single_retailer: Optional[BasketQuote] = None
+    split: Optional[BasketQuote] = None
+    savings: float = 0.0
+    unavailable: List[int] = []
+
+class FeedRow(BaseModel):
+    sku: str = Field(..., min_length=1)
+    name: str = Field(..., min_length=1)
+    category: str = Field(..., min_length=1)
+    store: str = Field(..., min_length=1)
+    price: float = Field(..., ge=0)
+    description: Optional[str] = None
+    image: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    batch_size: int
+    max_errors: int
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    products_created: int = 0
+    stores_created: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    errors: List[ImportRowError] = []
 
 ProductOut.update_forward_refs()
+ProductPage.update_forward_refs()
+ProductSearchResult.update_forward_refs()
@@ -0,0 +1,111 @@
+"""Full-text product search over an SQLite FTS5 index.
+
+`products_fts` holds one row per product (rowid = products.id) with its name, category and
+description. The product write paths in crud.py keep it in step in the same transaction,
+and `rebuild` repopulates it from the products table for seeding and repairs:
+
+    python -m backend.search rebuild
+
+Other databases have no FTS5, so there search falls back to the LIKE scan it replaces.
+"""
+import re
+import sys
+from sqlalchemy import DDL, event, select, delete, insert, func, literal_column, or_, table, column, text
+from . import models
+
+FTS_TABLE = "products_fts"
+
+# Prefix indexes make 2- and 3-character prefix queries an index lookup instead of a term scan
+FTS_DDL = DDL(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, category, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+event.listen(models.Base.metadata, "after_create", FTS_DDL.execute_if(dialect="sqlite"))
+
+products_fts = table(FTS_TABLE, column("rowid"), column("name"), column("category"), column("description"))
+
+# bm25 column weights: a hit in the name outranks one in the category, then the description
+RANK = func.bm25(literal_column(FTS_TABLE), 10.0, 4.0, 1.0)
+
+def enabled(db) -> bool:
+    return db.bind.dialect.name == "sqlite"
+
+def match_query(q: str) -> str | None:
+    """Turn free text into an FTS5 query: every word must match, each as a prefix."""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _matches(q: str):
+    return select(products_fts.c.rowid).where(text(f"{FTS_TABLE} MATCH :q").bindparams(q=match_query(q)))
+
+def like_filter(q: str):
+    # The pre-FTS baseline: a substring scan over every product row
+    pattern = f"%{q}%"
+    return or_(models.Product.name.ilike(pattern), models.Product.category.ilike(pattern), models.Product.description.ilike(pattern))
+
+def search_statement(q: str, category: str | None = None, limit: int = 20, offset: int = 0, fts: bool = True):
+    if fts:
+        ranked = _matches(q).add_columns(RANK.label("rank")).subquery()
+        stmt = select(models.Product).join(ranked, ranked.c.rowid == models.Product.id).order_by(ranked.c.rank, models.Product.id)
+    else:
+        stmt = select(models.Product).where(like_filter(q)).order_by(models.Product.id)
+    if category is not None:
+        stmt = stmt.where(models.Product.category == category)
+    return stmt.limit(limit).offset(offset)
+
+def facet_statement(q: str, fts: bool = True):
+    # Facets count every match, ignoring the category filter, so clients can switch categories
+    matched = models.Product.id.in_(_matches(q)) if fts else like_filter(q)
+    return (
+        select(models.Product.category, func.count(models.Product.id))
+        .where(matched)
+        .group_by(models.Product.category)
+        .order_by(func.count(models.Product.id).desc(), models.Product.category)
+    )
+
+def index_statements(db, product):
+    if not enabled(db):
+        return
+    yield delete(products_fts).where(products_fts.c.rowid == product.id)
+    yield insert(products_fts).values(
+        rowid=product.id, name=product.name, category=product.category, description=product.description or ""
+    )
+
+async def index_product(db, product):
+    for stmt in index_statements(db, product):
+        await db.execute(stmt)
+
+async def unindex_product(db, product_id: int):
+    if enabled(db):
+        await db.execute(delete(products_fts).where(products_fts.c.rowid == product_id))
+
+async def reindex_products(db, product_ids):
+    if not enabled(db):
+        return
+    await db.execute(delete(products_fts).where(products_fts.c.rowid.in_(product_ids)))
+    await db.execute(_index_from_products(product_ids))
+
+def _index_from_products(product_ids=None):
+    rows = select(models.Product.id, models.Product.name, models.Product.category, func.coalesce(models.Product.description, ""))
+    if product_ids is not None:
+        rows = rows.where(models.Product.id.in_(product_ids))
+    return insert(products_fts).from_select(["rowid", "name", "category", "description"], rows)
+
+def rebuild(db):
+    if not enabled(db):
+        return
+    db.execute(FTS_DDL)
+    db.execute(delete(products_fts))
+    db.execute(_index_from_products())
+    db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    db.commit()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python -m backend.search rebuild")
+    from .database import SessionLocal
+    with SessionLocal() as db:
+        rebuild(db)
+    print("Search index rebuilt.")
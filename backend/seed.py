@@ -1,13 +1,14 @@
 import sys
 import os
 import json
+from datetime import datetime
 
 # Ensure backend is in sys.path for direct script execution
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from sqlalchemy.orm import Session
-from backend.database import engine, SessionLocal
-from backend import models
+from backend.database import SessionLocal
+from backend import models, aggregates, history, pricing, search
 from .auth import hash_password
 
 # Sample data (copy from mockData.ts, adapted to Python)
@@ -103,8 +104,11 @@ RETAILER_DESCRIPTIONS = {
 def seed():
     db = SessionLocal()
     try:
-        # Clear existing data
-        db.query(models.Retailer).delete()
+        # Clear existing data; offer ids are reused, so their price history goes too
+        for model in (models.PriceObservation, models.DailyPriceRollup, models.WeeklyPriceRollup):
+            db.query(model).delete()
+        db.query(models.Offer).delete()
+        db.query(models.Store).delete()
         db.query(models.Product).delete()
         db.commit()
 
@@ -122,6 +126,26 @@ def seed():
             db.add(admin_user)
             db.commit()
 
+        # One row per store; its rating is the average across the products it carries
+        ratings = {}
+        for prod in PRODUCTS:
+            for r in prod["retailers"]:
+                ratings.setdefault(r["name"], []).append(r["rating"])
+        stores = {}
+        for prod in PRODUCTS:
+            for r in prod["retailers"]:
+                if r["name"] not in stores:
+                    stores[r["name"]] = models.Store(
+                        name=r["name"],
+                        logo=RETAILER_LOGOS.get(r["name"]),
+                        description=RETAILER_DESCRIPTIONS.get(r["name"]),
+                        rating=round(sum(ratings[r["name"]]) / len(ratings[r["name"]]), 2),
+                        delivery_options=r["delivery_options"],
+                    )
+        db.add_all(stores.values())
+        db.flush()
+
+        offers = []
         for prod in PRODUCTS:
             best_price = min([r["price"] for r in prod["retailers"]]) if prod["retailers"] else None
             product = models.Product(
@@ -134,17 +158,15 @@ def seed():
             db.add(product)
             db.flush()  # get product.id
             for r in prod["retailers"]:
-                retailer = models.Retailer(
-                    name=r["name"],
-                    logo=RETAILER_LOGOS.get(r["name"]),
-                    description=RETAILER_DESCRIPTIONS.get(r["name"]),
-                    rating=r["rating"],
-                    delivery_options=r["delivery_options"],
-                    product_id=product.id,
-                    price=r["price"]
-                )
-                db.add(retailer)
+                offers.append(models.Offer(product_id=product.id, store_id=stores[r["name"]].id, price=r["price"]))
+                db.add(offers[-1])
+        db.flush()
+        for stmt, rows in history.observation_statements(db, {o.id: o.price for o in offers}, datetime.utcnow()):
+            db.execute(stmt, rows)
+        db.execute(pricing.best_offer_statement())
         db.commit()
+        aggregates.rebuild(db)
+        search.rebuild(db)
         print("Database seeded successfully!")
     finally:
         db.close()
@@ -0,0 +1,108 @@
+"""Opt-in fast serialization for the hot list endpoints.
+
+With FAST_SERIALIZATION=1, list routes select plain columns instead of ORM entities,
+build dicts in the exact shape of the response models, and encode them with orjson. The
+rows come straight from our own tables, so they are not validated again by Pydantic. The
+default path keeps using the response models.
+
+Every route with a fast path returns the same bytes either way (same keys, order and
+formatting; tests/test_serialization.py checks this), so ETags and clients are unaffected by switching.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+import orjson
+from fastapi.responses import Response
+from sqlalchemy import select
+from . import models
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "0") == "1"
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+def utc_iso(value: datetime | None) -> str | None:
+    # Same form as the order schemas' date serializer
+    return None if value is None else value.isoformat(timespec="milliseconds") + "Z"
+
+# Column order follows the response models' field order
+PRODUCT_COLUMNS = (
+    models.Product.name, models.Product.category, models.Product.image, models.Product.description, models.Product.price,
+    models.Product.id, models.Product.sku, models.Product.best_retailer_id, models.Product.updated_at,
+)
+OFFER_COLUMNS = (
+    models.Store.name, models.Store.logo, models.Store.description, models.Store.rating, models.Store.delivery_options,
+    models.Offer.product_id, models.Offer.price, models.Offer.id, models.Offer.store_id,
+)
+OFFER_FIELDS = ("name", "logo", "description", "rating", "delivery_options", "product_id", "price", "id", "store_id")
+ORDER_COLUMNS = (
+    models.Order.date, models.Order.total, models.Order.payment, models.Order.address, models.Order.id,
+    models.Order.user_id, models.Order.status,
+)
+ORDER_ITEM_COLUMNS = (
+    models.OrderItem.order_id, models.OrderItem.product_name, models.OrderItem.quantity, models.OrderItem.retailer,
+    models.OrderItem.price, models.OrderItem.id,
+)
+# Admin lists, in the field order of UserOut (no password hash) and AdminOrderOut
+ADMIN_USER_COLUMNS = (
+    models.User.username, models.User.email, models.User.name, models.User.role, models.User.points, models.User.id,
+)
+ADMIN_ORDER_COLUMNS = ORDER_COLUMNS
+
+def products_query(skip: int = 0, limit: int = 100, cursor: int | None = None):
+    query = select(*PRODUCT_COLUMNS).order_by(models.Product.id).limit(limit)
+    return query.offset(skip) if cursor is None else query.where(models.Product.id > cursor)
+
+async def product_rows(db, query):
+    """Run a PRODUCT_COLUMNS query; return ProductOut-shaped dicts and the newest updated_at."""
+    products = (await db.execute(query)).all()
+    offers = defaultdict(list)
+    if products:
+        for row in await db.execute(
+            select(*OFFER_COLUMNS)
+            .join(models.Store, models.Store.id == models.Offer.store_id)
+            .where(models.Offer.product_id.in_([p.id for p in products]))
+            .order_by(models.Offer.id)
+        ):
+            offers[row.product_id].append(dict(zip(OFFER_FIELDS, row)))
+    items = [
+        {
+            "name": p.name, "category": p.category, "image": p.image, "description": p.description, "price": p.price,
+            "id": p.id, "sku": p.sku, "best_retailer_id": p.best_retailer_id, "retailers": offers[p.id],
+        }
+        for p in products
+    ]
+    last_modified = max((p.updated_at for p in products if p.updated_at), default=None)
+    return items, last_modified
+
+async def order_rows(db, query):
+    """Run an ORDER_COLUMNS query; return OrderOut-shaped dicts with their items."""
+    orders = (await db.execute(query)).all()
+    items = defaultdict(list)
+    if orders:
+        for row in await db.execute(
+            select(*ORDER_ITEM_COLUMNS).where(models.OrderItem.order_id.in_([o.id for o in orders])).order_by(models.OrderItem.id)
+        ):
+            items[row.order_id].append(
+                {"product_name": row.product_name, "quantity": row.quantity, "retailer": row.retailer, "price": row.price, "id": row.id}
+            )
+    return [
+        {
+            "date": utc_iso(o.date), "total": o.total, "payment": o.payment, "address": o.address, "id": o.id,
+            "items": items[o.id], "user_id": o.user_id, "status": o.status,
+        }
+        for o in orders
+    ]
+
+async def mapping_rows(db, query):
+    """Rows of a column projection as dicts keyed by column name."""
+    return [
+        {key: utc_iso(value) if isinstance(value, datetime) else value for key, value in row.items()}
+        for row in (await db.execute(query)).mappings()
+    ]
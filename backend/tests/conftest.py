@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+# Read when backend.database is imported, so set before any test module imports the app
+_scratch = tempfile.mkdtemp(prefix="royalbee-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}/test.db"
+
+import pytest
+from backend import migrations
+from backend.database import make_engine
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from backend import seed
+    from backend.main import app
+    engine = make_engine()
+    with engine.begin() as conn:
+        migrations.create(conn)
+    engine.dispose()
+    with TestClient(app) as client:
+        seed.seed()
+        yield client
+
+@pytest.fixture
+def admin_headers(client):
+    token = client.post("/admin/login", json={"username": "admin"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,15 @@
+from backend import admission
+
+def test_exports_and_imports_have_their_own_class():
+    assert admission.classify("GET", "/admin/orders/export").name == "bulk"
+    assert admission.classify("POST", "/admin/import").name == "bulk"
+    assert admission.classify("GET", "/admin/import").name == "admin"
+    assert admission.classify("GET", "/admin/orders").name == "admin"
+
+def test_long_request_does_not_push_estimate_past_deadline():
+    route_class = admission.RouteClass("admin", concurrency=4, queue=16, deadline_ms=5000)
+    route_class.active = 1
+    route_class.release(300.0)  # a five minute request
+    assert route_class.service_seconds <= route_class.deadline
+    # The next queued request is still admitted to the queue, not shed on arrival
+    assert route_class.expected_wait(1) <= route_class.deadline
@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import select
+from backend import history, models
+from backend.database import AsyncSessionLocal, SessionLocal
+
+def rollups() -> list:
+    with SessionLocal() as db:
+        return [
+            db.execute(select(model.offer_id, model.bucket, model.low, model.high, model.total, model.samples,
+                              model.close, model.closed_at).order_by(model.offer_id, model.bucket)).all()
+            for model, _ in history.ROLLUPS.values()
+        ]
+
+def test_same_second_writes_match_rebuild(client):
+    with SessionLocal() as db:
+        offer_id = db.scalar(select(models.Offer.id).order_by(models.Offer.id))
+
+    async def write():
+        async with AsyncSessionLocal() as db:
+            await history.record(db, {offer_id: 1.00}, datetime(2026, 3, 4, 12, 0, 0))
+            await history.record(db, {offer_id: 5.00}, datetime(2026, 3, 4, 12, 0, 1))
+            # Same second as the previous write: replaces 5.00, both for the chart and the rollups
+            await history.record(db, {offer_id: 3.00}, datetime(2026, 3, 4, 12, 0, 1, 500000))
+            await db.commit()
+
+    asyncio.run(write())
+    incremental = rollups()
+    with SessionLocal() as db:
+        history.rebuild(db)
+    assert incremental == rollups()
+    day = [row for row in incremental[0] if row.offer_id == offer_id and row.bucket == history.bucket_start(
+        history.epoch(datetime(2026, 3, 4)), history.DAY)][0]
+    assert (day.low, day.high, day.total, day.samples, day.close) == (100, 300, 400, 2, 300)
@@ -0,0 +1,14 @@
+FEED = b"""sku,name,category,store,price
+IMP-1,Imported Oats,Pantry,Import Mart,2.5
+IMP-2,Imported Rice,Pantry,Import Mart,-1
+IMP-3,Imported Beans,Pantry,Import Mart,1.25
+"""
+
+def test_import_feed(client, admin_headers):
+    response = client.post("/admin/import?batch_size=2", headers=admin_headers,
+                           files={"feed": ("feed.csv", FEED, "text/csv")})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["rows"], report["imported"], report["rejected"], report["batches"]) == (3, 2, 1, 2)
+    assert [error["line"] for error in report["errors"]] == [3]
+    assert client.get("/admin/import", headers=admin_headers).json() == report
@@ -0,0 +1,31 @@
+import importlib
+import pytest
+from sqlalchemy import create_engine, text
+from backend import migrations
+
+def test_strict_is_the_default(monkeypatch):
+    monkeypatch.delenv("SCHEMA_CHECK", raising=False)
+    try:
+        importlib.reload(migrations)
+        assert migrations.SCHEMA_CHECK == "strict"
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn, pytest.raises(RuntimeError, match="alembic upgrade head"):
+            migrations.check(conn)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(migrations)
+
+def test_strict_refuses_a_database_behind_head():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY)"))
+        with pytest.raises(RuntimeError, match="alembic upgrade head"):
+            migrations.check(conn, "strict")
+        # create only ever builds an empty database; anything else is left alone
+        assert migrations.check(conn, "create") == "mismatch"
+
+def test_create_builds_and_stamps_an_empty_database():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        assert migrations.check(conn, "create") == "created"
+        assert migrations.check(conn, "strict") == "current"
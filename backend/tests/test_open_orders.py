@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, event, func, select
+from backend import crud, models
+
+def query_plan(query) -> str:
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with engine.connect() as conn:
+        conn.execute(query)
+        statement, parameters = statements[-1]
+        return " ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+
+def test_open_orders_use_partial_index():
+    assert "USING INDEX ix_orders_open" in query_plan(crud.open_orders_query(cursor=10, limit=50))
+
+def test_open_orders_by_status_use_partial_index():
+    assert "USING INDEX ix_orders_open" in query_plan(crud.open_orders_query(status="processing"))
+
+def test_open_order_count_uses_partial_index():
+    query = select(func.count(models.Order.id)).where(models.order_is_open())
+    assert "ix_orders_open" in query_plan(query)
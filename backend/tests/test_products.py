@@ -0,0 +1,19 @@
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from backend import catalog
+
+def test_delete_product_with_offers(client):
+    product = client.get("/products?limit=1").json()[0]
+    assert product["retailers"]
+    assert client.delete(f"/products/{product['id']}").status_code == 200
+    assert product["id"] not in [p["id"] for p in client.get("/products").json()]
+    assert client.get(f"/products/{product['id']}/price-history").status_code == 404
+
+def test_product_list_last_modified_follows_catalog_version(client):
+    first = client.get("/products?limit=1").json()[0]
+    product = client.get("/products").json()[-1]
+    assert product["id"] != first["id"]
+    assert client.delete(f"/products/{product['id']}").status_code == 200
+    # The first page's rows are unchanged, but the delete moved the catalog on
+    last_modified = parsedate_to_datetime(client.get("/products?limit=1").headers["last-modified"])
+    assert last_modified == catalog.modified_at().replace(microsecond=0, tzinfo=timezone.utc)
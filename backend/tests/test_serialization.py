@@ -0,0 +1,34 @@
+import pytest
+from backend import catalog, serialization
+
+ORDER = {
+    "date": "2026-10-18T10:00:00.000Z", "total": 12.5, "payment": "Card", "address": "1 Test Street", "user_id": 1,
+    "items": [{"product_name": "Whole Milk (2L)", "quantity": 2, "retailer": "Tesco", "price": 1.4}],
+}
+
+@pytest.fixture(scope="module")
+def order(client):
+    return client.post("/api/orders", json=ORDER).json()
+
+@pytest.mark.parametrize("url", [
+    "/products?limit=3",
+    "/products?cursor=0&limit=3",
+    "/api/orders?userId=1",
+    "/admin/users",
+    "/admin/orders",
+])
+def test_fast_path_matches_default_path(client, order, monkeypatch, url):
+    bodies = []
+    for fast in (False, True):
+        monkeypatch.setattr(serialization, "FAST_SERIALIZATION", fast)
+        catalog.bump_version()  # catalog pages are cached whichever path built them
+        response = client.get(url)
+        assert response.status_code == 200
+        bodies.append(response.content)
+    assert bodies[0] == bodies[1]
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_admin_users_omit_password_hash(client, monkeypatch, fast):
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", fast)
+    users = client.get("/admin/users").json()
+    assert users and all("hashed_password" not in user for user in users)
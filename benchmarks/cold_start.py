@@ -0,0 +1,131 @@
+"""Cold start: how long a new server worker takes to import the app and answer its first request.
+
+Runs against a scratch database created at the Alembic head, with SCHEMA_CHECK=strict
+as in production, and reports median and worst case per measurement:
+
+  import   `import backend.main` in a fresh interpreter, which every spawned worker
+           (uvicorn --workers) pays; also checks that the import built no engine
+  fork     a process that has already imported the app forks, and the child runs the
+           lifespan and serves GET /products (the gunicorn --preload model)
+  uvicorn  from starting `uvicorn --workers N` to the first 200 from GET /products
+
+    python -m benchmarks.cold_start --repeat 5 --workers 1 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PROBE = "/products?limit=1"
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import backend.main, backend.database as database; "
+    "print(time.perf_counter() - start, database._engines is None)"
+)
+
+def prepare(url: str):
+    from backend import migrations
+    from backend.database import make_engine
+    engine = make_engine(url)
+    with engine.begin() as conn:
+        migrations.create(conn)
+    engine.dispose()
+
+def measure_import(env: dict, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_PROBE], env=env,
+                             capture_output=True, text=True, check=True).stdout.split()
+        if out[1] != "True":
+            sys.exit("importing backend.main built a database engine")
+        samples.append(float(out[0]))
+    return samples
+
+async def first_response(app) -> int:
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            return (await client.get(PROBE)).status_code
+
+def measure_fork(repeat: int) -> list:
+    import logging
+    from backend.main import app
+    logging.getLogger().setLevel(logging.WARNING)
+    samples = []
+    for _ in range(repeat):
+        read_end, write_end = os.pipe()
+        start = time.perf_counter()  # CLOCK_MONOTONIC; the child reads the same clock
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            status = asyncio.run(first_response(app))
+            os.write(write_end, f"{status} {time.perf_counter() - start}".encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            status, seconds = pipe.read().split()
+        os.waitpid(pid, 0)
+        if status != "200":
+            sys.exit(f"forked worker answered {status}")
+        samples.append(float(seconds))
+    return samples
+
+def measure_uvicorn(env: dict, workers: int, port: int, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        log = tempfile.TemporaryFile()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--workers", str(workers),
+             "--log-level", "warning", "--no-access-log"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+                while time.perf_counter() - start < 60:
+                    try:
+                        if client.get(PROBE).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.005)
+                else:
+                    log.seek(0)
+                    sys.exit("uvicorn did not start:\n" + log.read().decode(errors="replace"))
+            samples.append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+            log.close()
+    return samples
+
+def format_row(label: str, samples: list) -> str:
+    return f"{label:<20}{len(samples):>6}{statistics.median(samples) * 1000:>12.1f}{max(samples) * 1000:>12.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="uvicorn worker counts to start")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        os.environ.update(DATABASE_URL=url, SCHEMA_CHECK="strict")
+        env = {**os.environ, "PYTHONPATH": ROOT}
+        prepare(url)
+        print(f"{'measurement':<20}{'runs':>6}{'median ms':>12}{'max ms':>12}")
+        print(format_row("import", measure_import(env, args.repeat)), flush=True)
+        for workers in args.workers:
+            print(format_row(f"uvicorn x{workers}", measure_uvicorn(env, workers, args.port, args.repeat)), flush=True)
+        # Last: this imports the app into the benchmark process itself
+        print(format_row("fork", measure_fork(args.repeat)), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Bytes saved by response compression on catalog pages, and what each level costs.
+
+Builds /products bodies for 100, 1k and 10k item pages (as benchmarks/serialization.py
+does), then encodes each with the gzip levels and, when the optional brotli package is
+installed, the brotli qualities below. Reports size, ratio and encode time, to pick
+COMPRESSION_GZIP_LEVEL / COMPRESSION_BROTLI_QUALITY.
+
+    python -m benchmarks.compression --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from backend import compression
+from backend.database import make_engine, make_async_engine
+from benchmarks.serialization import SIZES, prepare, fast_body
+
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 4, 11)
+
+def settings():
+    for level in GZIP_LEVELS:
+        yield f"gzip -{level}", lambda level=level: compression.GzipEncoder(level)
+    if compression.brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            yield f"br q{quality}", lambda quality=quality: compression.BrotliEncoder(quality)
+
+async def bodies(url: str) -> dict:
+    engine = make_async_engine(url)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        result = {size: await fast_body(db, size) for size in SIZES}
+    await engine.dispose()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        engine = make_engine(url)
+        prepare(engine, max(SIZES))
+        engine.dispose()
+        pages = asyncio.run(bodies(url))
+    if compression.brotli is None:
+        print("brotli not installed; gzip only")
+    print(f"{'items':>8}{'encoding':>10}{'bytes':>10}{'ratio':>8}{'saved':>10}{'ms':>8}")
+    for size, body in pages.items():
+        print(f"{size:>8}{'identity':>10}{len(body):>10}{1:>8.3f}{0:>10}{0:>8.2f}")
+        for name, make in settings():
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data = make().finish(body)
+                samples.append(time.perf_counter() - start)
+            ms = statistics.median(samples) * 1000
+            print(f"{size:>8}{name:>10}{len(data):>10}{len(data) / len(body):>8.3f}{len(body) - len(data):>10}{ms:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Synthetic data generator: fills the schema to production-like sizes.
+
+Everything is derived from --seed, so the same arguments always produce the same
+database. Rows go in with chunked Core inserts, so memory stays flat even at tens of
+millions of order items. The generator then rebuilds the derived tables (best offers,
+search index, dashboard aggregates) the way seed.py does.
+
+    python -m benchmarks.datagen --database sqlite:///bench.db --products 100000 --orders 2500000
+
+Every generated user can log in as user<N>@bench.royalbee.com with password
+BENCH_PASSWORD; benchmarks/load.py relies on that.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert, func, select
+from sqlalchemy.orm import Session
+from backend import models, aggregates, migrations, pricing, search
+from backend.database import make_engine
+from backend.hashing import hash_password
+
+BENCH_PASSWORD = "bench-password"
+CHUNK_ROWS = 20000
+
+CATEGORIES = ["Fresh Produce", "Dairy", "Bakery", "Meat", "Pantry", "Frozen", "Drinks", "Household", "Snacks", "Baby"]
+ADJECTIVES = ["Organic", "Free-Range", "Wholemeal", "Smoked", "Fresh", "Classic", "Light", "Extra Mature", "Roasted", "Sparkling"]
+NOUNS = ["Bananas", "Milk", "Bread", "Chicken", "Eggs", "Cheddar", "Pasta", "Rice", "Coffee", "Tea", "Yoghurt",
+         "Butter", "Juice", "Water", "Crisps", "Soup", "Beans", "Tomatoes", "Apples", "Salmon"]
+PAYMENTS = ["Card", "PayPal", "Apple Pay", "Cash on delivery"]
+# Most history is delivered; a small tail is still open
+STATUSES = (["delivered"] * 80) + (["shipped"] * 8) + (["cancelled"] * 4) + (["processing"] * 4) + (["pending"] * 4)
+
+def user_email(i: int) -> str:
+    return f"user{i}@bench.royalbee.com"
+
+def insert_chunks(db, model, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            db.execute(insert(model), chunk)
+            chunk = []
+    if chunk:
+        db.execute(insert(model), chunk)
+
+def generate(db, rng, users: int, products: int, stores: int, offers_per_product: int, orders: int, items_per_order: int, days: int):
+    first_user = (db.scalar(select(func.max(models.User.id))) or 0) + 1
+    first_product = (db.scalar(select(func.max(models.Product.id))) or 0) + 1
+    first_order = (db.scalar(select(func.max(models.Order.id))) or 0) + 1
+
+    # bcrypt is deliberately slow; every synthetic user shares one hash
+    hashed = hash_password(BENCH_PASSWORD)
+    insert_chunks(db, models.User, (
+        {"id": first_user + i, "email": user_email(first_user + i), "hashed_password": hashed, "name": f"Bench User {first_user + i}",
+         "role": "customer", "points": 0}
+        for i in range(users)
+    ))
+
+    existing = set(db.scalars(select(models.Store.name)))
+    new_stores = [f"Store {i}" for i in range(stores) if f"Store {i}" not in existing]
+    if new_stores:
+        db.execute(insert(models.Store), [
+            {"name": name, "logo": "🏪", "description": f"{name} groceries", "rating": round(rng.uniform(3.5, 5.0), 2),
+             "delivery_options": rng.choice(["Same day delivery", "Next day delivery", "2-3 day delivery"])}
+            for name in new_stores
+        ])
+    store_ids = dict(db.execute(select(models.Store.name, models.Store.id).where(models.Store.name.like("Store %"))).all())
+    store_names = list(store_ids)
+
+    names = []
+    def product_rows():
+        for i in range(products):
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{first_product + i}"
+            names.append(name)
+            yield {"id": first_product + i, "name": name, "sku": f"BENCH-{first_product + i}", "category": rng.choice(CATEGORIES),
+                   "description": f"{name} from the synthetic catalog", "image": None}
+    insert_chunks(db, models.Product, product_rows())
+
+    def offer_rows():
+        per_product = min(offers_per_product, len(store_names))
+        for i in range(products):
+            base = rng.uniform(0.5, 15)
+            for name in rng.sample(store_names, per_product):
+                yield {"product_id": first_product + i, "store_id": store_ids[name], "price": round(base * rng.uniform(0.9, 1.2), 2)}
+    insert_chunks(db, models.Offer, offer_rows())
+
+    now = datetime.utcnow()
+    order_chunk, item_chunk = [], []
+    for i in range(orders if users else 0):
+        order_id = first_order + i
+        lines = [(rng.choice(names), rng.randint(1, 4), rng.choice(store_names), round(rng.uniform(0.5, 15), 2))
+                 for _ in range(max(1, round(rng.expovariate(1 / items_per_order))))]
+        order_chunk.append({
+            "id": order_id, "user_id": first_user + rng.randrange(users), "date": now - timedelta(seconds=rng.randrange(days * 86400)),
+            "total": round(sum(q * p for _, q, _, p in lines), 2), "payment": rng.choice(PAYMENTS),
+            "address": f"{rng.randint(1, 300)} Bench Street", "status": rng.choice(STATUSES),
+        })
+        item_chunk.extend({"order_id": order_id, "product_name": n, "quantity": q, "retailer": r, "price": p} for n, q, r, p in lines)
+        # Orders go in before their items so the foreign keys hold on every backend
+        if len(item_chunk) >= CHUNK_ROWS or i == orders - 1:
+            db.execute(insert(models.Order), order_chunk)
+            db.execute(insert(models.OrderItem), item_chunk)
+            order_chunk, item_chunk = [], []
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--offers-per-product", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--items-per-order", type=float, default=4, help="mean; item counts are exponentially distributed")
+    parser.add_argument("--days", type=int, default=365, help="spread order dates over this many days back")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    engine = make_engine(args.database)
+    with engine.begin() as conn:
+        # Stamped at head, so servers started on it with SCHEMA_CHECK=strict accept it
+        migrations.create(conn)
+    with Session(engine) as db:
+        generate(db, random.Random(args.seed), args.users, args.products, args.stores, args.offers_per_product,
+                 args.orders, args.items_per_order, args.days)
+        print(f"Rows inserted in {time.perf_counter() - started:.1f}s; rebuilding derived tables...", flush=True)
+        db.execute(pricing.best_offer_statement())
+        db.commit()
+        search.rebuild(db)
+        aggregates.rebuild(db)
+        counts = {model.__tablename__: db.scalar(select(func.count()).select_from(model))
+                  for model in (models.User, models.Product, models.Offer, models.Order, models.OrderItem)}
+    engine.dispose()
+    print(", ".join(f"{n} {t}" for t, n in counts.items()) + f" in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Load benchmark: latency percentiles and throughput per endpoint.
+
+Drives the app either in-process (httpx over ASGI, no network) or through a local uvicorn
+started for the run, against a database filled by benchmarks/datagen.py. Each endpoint is
+hit with --requests requests from --concurrency concurrent clients. The report gives
+p50/p95/p99 latency, requests per second and errors.
+
+Results can be saved as a named baseline under benchmarks/baselines/ and later runs
+compared against it. The compare run exits non-zero on a regression beyond --tolerance.
+
+    python -m benchmarks.datagen --database sqlite:///bench.db
+    python -m benchmarks.load --database sqlite:///bench.db --save-baseline local
+    python -m benchmarks.load --database sqlite:///bench.db --mode uvicorn --compare local
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+ENDPOINTS = ("products", "products_cursor", "orders", "token", "metrics")
+
+class Context:
+    def __init__(self, database: str, seed: int):
+        from backend import models
+        from backend.database import make_engine
+        engine = make_engine(database)
+        with Session(engine) as db:
+            self.max_product = db.scalar(select(func.max(models.Product.id))) or 1
+            self.user_ids = (db.execute(
+                select(func.min(models.User.id), func.max(models.User.id)).where(models.User.email.like("%@bench.royalbee.com"))
+            ).one())
+            self.product_names = list(db.scalars(select(models.Product.name).limit(1000)))
+        engine.dispose()
+        if self.user_ids[0] is None:
+            sys.exit("no synthetic users found; fill the database with benchmarks.datagen first")
+        self.rng = random.Random(seed)
+
+    def user_id(self) -> int:
+        return self.rng.randint(*self.user_ids)
+
+def order_body(ctx: Context) -> dict:
+    items = [
+        {"product_name": ctx.rng.choice(ctx.product_names), "quantity": ctx.rng.randint(1, 3), "retailer": "Store 0", "price": 2.5}
+        for _ in range(ctx.rng.randint(1, 5))
+    ]
+    return {
+        "user_id": ctx.user_id(), "date": datetime.now(timezone.utc).isoformat(), "payment": "Card", "address": "1 Load Street",
+        "total": sum(i["quantity"] * i["price"] for i in items), "items": items,
+    }
+
+def request_for(endpoint: str, ctx: Context):
+    from benchmarks.datagen import BENCH_PASSWORD, user_email
+    if endpoint == "products":
+        return "GET", f"/products?skip={ctx.rng.randrange(max(ctx.max_product - 50, 1))}&limit=50", {}
+    if endpoint == "products_cursor":
+        return "GET", f"/products?cursor={ctx.rng.randrange(max(ctx.max_product - 50, 1))}&limit=50", {}
+    if endpoint == "orders":
+        return "POST", "/api/orders", {"json": order_body(ctx)}
+    if endpoint == "token":
+        return "POST", "/token", {"data": {"username": user_email(ctx.user_id()), "password": BENCH_PASSWORD}}
+    return "GET", "/admin/metrics", {}
+
+async def drive(client, endpoint: str, ctx: Context, requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = request_for(endpoint, ctx)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+async def run_endpoints(client, endpoints, ctx, requests: int, concurrency: int, warmup: int) -> dict:
+    results = {}
+    for endpoint in endpoints:
+        if warmup:
+            await drive(client, endpoint, ctx, warmup, concurrency)
+        results[endpoint] = await drive(client, endpoint, ctx, requests, concurrency)
+        print(format_row(endpoint, results[endpoint]), flush=True)
+    return results
+
+async def run_inprocess(args, ctx) -> dict:
+    from backend.main import app, order_ingestor
+    from backend import auth
+    logging.getLogger().setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_endpoints(client, args.endpoints, ctx, args.requests, args.concurrency, args.warmup)
+    finally:
+        await order_ingestor.stop()
+        auth.hash_pool.shutdown()
+
+async def run_uvicorn(args, ctx) -> dict:
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    # The app logs every order body; keep server output out of the report unless it fails to start
+    log = tempfile.TemporaryFile()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, "DATABASE_URL": args.database, "PYTHONPATH": root}, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            for _ in range(200):
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                log.seek(0)
+                sys.exit("uvicorn did not start:\n" + log.read().decode(errors="replace"))
+            return await run_endpoints(client, args.endpoints, ctx, args.requests, args.concurrency, args.warmup)
+    finally:
+        server.terminate()
+        server.wait()
+        log.close()
+
+def format_row(endpoint: str, r: dict) -> str:
+    return f"{endpoint:<18}{r['requests']:>8}{r['errors']:>8}{r['rps']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for endpoint, r in results.items():
+        base = baseline["results"].get(endpoint)
+        if base is None:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {base['p95_ms']}ms -> {r['p95_ms']}ms")
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {base['rps']} -> {r['rps']} req/s")
+        if r["errors"] > base["errors"]:
+            regressions.append(f"{endpoint}: errors {base['errors']} -> {r['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="unrecorded requests per endpoint first")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before a regression")
+    args = parser.parse_args()
+    # backend.database reads DATABASE_URL at import, so set it before anything imports the app
+    os.environ["DATABASE_URL"] = args.database
+
+    ctx = Context(args.database, args.seed)
+    print(f"{args.mode}, concurrency {args.concurrency}, {args.requests} requests per endpoint")
+    print(f"{'endpoint':<18}{'requests':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    results = asyncio.run(runner(args, ctx))
+
+    config = {k: getattr(args, k) for k in ("mode", "requests", "concurrency", "workers", "seed")}
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump({"created": datetime.now(timezone.utc).isoformat(), "config": config, "results": results}, f, indent=2)
+        print(f"Baseline saved to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            print(f"warning: baseline was recorded with {baseline['config']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against '{args.compare}' (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Latency of /products/{id}/price-history over years of observations.
+
+Builds a scratch history (--offers-per-product offers per product, one observation per
+offer per --interval-hours over --years), rebuilds the rollups, then times
+history.product_history for random products at each span the endpoint defaults to:
+raw for a week, daily for up to a year and weekly beyond.
+
+    python -m benchmarks.price_history --products 2000 --years 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+from backend import history, models
+from backend.database import make_engine, make_async_engine
+
+CHUNK_ROWS = 50000
+SPANS = (("7 days", 7), ("90 days", 90), ("1 year", 365), ("all", None))
+BUDGET_MS = 100
+
+def prepare(engine, products: int, offers_per_product: int, years: int, interval_hours: int, seed: int = 42):
+    rng = random.Random(seed)
+    models.Base.metadata.create_all(bind=engine)
+    end = history.epoch(datetime.utcnow())
+    start = end - years * 365 * history.DAY
+    step = interval_hours * 3600
+    with Session(engine) as db:
+        db.execute(insert(models.Store), [{"name": f"Store {s}"} for s in range(offers_per_product)])
+        db.execute(insert(models.Product), [{"name": f"Product {i}", "category": "Bench"} for i in range(products)])
+        db.execute(insert(models.Offer), [
+            {"product_id": i + 1, "store_id": s + 1, "price": 1.0} for i in range(products) for s in range(offers_per_product)
+        ])
+        chunk = []
+        for offer_id in range(1, products * offers_per_product + 1):
+            price = rng.randint(50, 1500)
+            for at in range(start, end, step):
+                # A small random walk, with the odd promotion
+                price = max(10, price + rng.choice((-2, -1, 0, 0, 0, 0, 1, 2)))
+                chunk.append({"offer_id": offer_id, "observed_at": at, "price": price // 2 if rng.random() < 0.01 else price})
+            if len(chunk) >= CHUNK_ROWS:
+                db.execute(insert(models.PriceObservation), chunk)
+                chunk = []
+        if chunk:
+            db.execute(insert(models.PriceObservation), chunk)
+        db.commit()
+        history.rebuild(db)
+
+async def run(url: str, products: int, years: int, repeat: int, seed: int = 42):
+    rng = random.Random(seed)
+    engine = make_async_engine(url)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    end = datetime.utcnow()
+    print(f"{'span':<10}{'resolution':>12}{'points':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    slow = []
+    for label, days in SPANS:
+        start = end - timedelta(days=days or years * 365)
+        samples, points = [], 0
+        for _ in range(repeat):
+            async with sessions() as db:
+                began = time.perf_counter()
+                result = await history.product_history(db, rng.randint(1, products), start, end)
+                samples.append(time.perf_counter() - began)
+            points = sum(len(series.points) for series in result.series)
+        cuts = statistics.quantiles(samples, n=20) if len(samples) > 1 else samples * 19
+        p50, p95 = statistics.median(samples) * 1000, cuts[18] * 1000
+        print(f"{label:<10}{result.resolution:>12}{points:>8}{p50:>10.2f}{p95:>10.2f}")
+        if p95 > BUDGET_MS:
+            slow.append(label)
+    await engine.dispose()
+    return slow
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--offers-per-product", type=int, default=4)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--interval-hours", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{tmp}/bench.db"
+        engine = make_engine(url)
+        started = time.perf_counter()
+        prepare(engine, args.products, args.offers_per_product, args.years, args.interval_hours)
+        engine.dispose()
+        print(f"History built in {time.perf_counter() - started:.1f}s")
+        slow = asyncio.run(run(url, args.products, args.years, args.repeat))
+    if slow:
+        sys.exit(f"p95 over the {BUDGET_MS} ms budget for: {', '.join(slow)}")
+
+if __name__ == "__main__":
+    main()
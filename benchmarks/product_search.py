@@ -0,0 +1,74 @@
+"""Latency of /products/search queries: FTS5 index against the LIKE '%term%' baseline.
+
+Builds a scratch catalog of synthetic products, then times the search and facet
+statements from backend/search.py both ways for a set of terms and prefixes.
+
+    python -m benchmarks.product_search --products 50000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from backend import models, search
+from backend.database import make_engine
+
+CATEGORIES = ["Fresh Produce", "Dairy", "Bakery", "Meat", "Pantry", "Frozen", "Drinks", "Household"]
+WORDS = [
+    "organic", "banana", "apple", "milk", "cheddar", "sourdough", "bread", "chicken", "breast", "eggs",
+    "free", "range", "butter", "yoghurt", "pasta", "rice", "tomato", "basil", "olive", "oil", "coffee",
+    "tea", "orange", "juice", "sparkling", "water", "frozen", "peas", "pizza", "detergent", "sponge",
+]
+QUERIES = ["banana", "ban", "olive oil", "chick", "sparkling water", "zzz"]
+
+def prepare(engine, products: int, seed: int = 42):
+    rng = random.Random(seed)
+    models.Base.metadata.create_all(bind=engine)
+    rows = [
+        {
+            "name": " ".join(rng.choices(WORDS, k=3)).title(),
+            "category": rng.choice(CATEGORIES),
+            "description": " ".join(rng.choices(WORDS, k=12)),
+        }
+        for _ in range(products)
+    ]
+    with Session(engine) as db:
+        db.execute(insert(models.Product), rows)
+        db.commit()
+        search.rebuild(db)
+
+def time_query(db, q: str, fts: bool, repeat: int) -> tuple[float, int]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.scalars(search.search_statement(q, fts=fts)).all()
+        facets = db.execute(search.facet_statement(q, fts=fts)).all()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, sum(count for _, count in facets)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{tmp}/bench.db")
+        prepare(engine, args.products)
+        print(f"{'query':<18}{'matches':>10}{'like ms':>10}{'fts ms':>10}{'speedup':>10}")
+        with Session(engine) as db:
+            for q in QUERIES:
+                like_ms, like_hits = time_query(db, q, fts=False, repeat=args.repeat)
+                fts_ms, fts_hits = time_query(db, q, fts=True, repeat=args.repeat)
+                # Match counts differ where LIKE finds substrings inside words and FTS only word prefixes
+                print(f"{q:<18}{f'{like_hits}/{fts_hits}':>10}{like_ms:>10.2f}{fts_ms:>10.2f}{like_ms / fts_ms:>9.1f}x")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Mixed read/write throughput of the SQLite storage profiles.
+
+Runs reader threads paging through the catalog and writer threads inserting orders
+against a scratch database, once per profile, and reports operations per second and
+"database is locked" failures.
+
+    python -m benchmarks.sqlite_profile --seconds 10 --readers 8 --writers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from backend import models
+from backend.database import make_engine
+
+def prepare(engine, products: int):
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.execute(insert(models.User), [{"email": "bench@royalbee.com", "hashed_password": "x", "name": "Bench"}])
+        db.execute(insert(models.Product), [{"name": f"Product {i}", "category": "Bench", "price": 1.0} for i in range(products)])
+        db.commit()
+
+def run(profile: str, seconds: float, readers: int, writers: int, products: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{tmp}/bench.db", profile=profile)
+        prepare(engine, products)
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def bump(key):
+            with lock:
+                counts[key] += 1
+
+        def reader():
+            while time.perf_counter() < deadline:
+                try:
+                    with Session(engine) as db:
+                        db.scalars(select(models.Product).order_by(models.Product.id).limit(50)).all()
+                    bump("reads")
+                except OperationalError:
+                    bump("locked")
+
+        def writer():
+            while time.perf_counter() < deadline:
+                try:
+                    with Session(engine) as db:
+                        db.add(models.Order(user_id=1, date=datetime(2026, 1, 1), total=12.5, payment="Card", address="Bench",
+                                            items=[models.OrderItem(product_name="Product 1", quantity=2, retailer="Bench", price=1.0)]))
+                        db.commit()
+                    bump("writes")
+                except OperationalError:
+                    bump("locked")
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+        return {k: v / seconds if k != "locked" else v for k, v in counts.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--products", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'locked':>10}")
+    for profile in ("default", "production"):
+        result = run(profile, args.seconds, args.readers, args.writers, args.products)
+        print(f"{profile:<12}{result['reads']:>12.1f}{result['writes']:>12.1f}{result['locked']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from backend.database import SessionLocal
 from backend.models import User
-import bcrypt
+from backend.hashing import hash_password
 
 # --- CONFIGURE THESE ---
 username = "admin"
@@ -12,7 +12,7 @@ user = db.query(User).filter(User.username == username).first()
 if not user:
     print("Admin user not found!")
 else:
-    hashed = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+    hashed = hash_password(new_password)
     user.hashed_password = hashed
     db.commit()
     print(f"Password for {username} updated successfully!")